@@ -1,4 +1,3 @@
-import json
 import logging
 import asyncio
 from typing import Tuple
@@ -7,14 +6,24 @@ from datetime import datetime
 
 from websockets import ServerConnection
 
+from src.interface import serialization
+from src.GPTServer.PasswordHasher import (
+    hash_password_async,
+    is_valid_password,
+    needs_rehash,
+    verify_password_async,
+)
 from src.interface.MessageFormat import MessageFormat
 from src.interface.ErrorCode import ErrorCode
 from src.interface.GPTServerError import AuthenticationError, GPTServerError
 from src.database.models import User
-from src.database.operations import DatabaseOperations
+from src.database.operations import DatabaseOperations, DuplicateUserError
 
 logger = logging.getLogger(__name__)
 
+# 固定内容的错误响应，导入时序列化一次
+_ERR_AUTH_INVALID_FORMAT = MessageFormat.create_error_response("认证消息格式错误", ErrorCode.AUTH_INVALID_FORMAT.value)
+
 class AuthenticationHandler:
     """WebSocket认证处理器"""
     
@@ -53,12 +62,12 @@ class AuthenticationHandler:
             if not password:
                 raise AuthenticationError("认证消息中缺少password", ErrorCode.AUTH_MISSING_PASSWORD)
                 
-            user = self.db_ops.get_user_by_username(username)
+            user = await asyncio.to_thread(self.db_ops.get_user_by_username, username)
             if not user:
                 raise AuthenticationError("用户不存在", ErrorCode.AUTH_USER_NOT_FOUND)
                 
-            # 验证密码（实际应用中应该使用加密后的密码比较）
-            if user.password != password:
+            # 验证密码（常量时间比较，哈希计算在线程池中执行）
+            if not await verify_password_async(user.password, password):
                 raise AuthenticationError("密码错误", ErrorCode.AUTH_INVALID_PASSWORD)
             
             # 发送登录成功消息
@@ -68,12 +77,25 @@ class AuthenticationHandler:
                     username=user.username
                 )
             )
+
+            # 旧的明文密码在登录成功后升级为argon2哈希
+            if needs_rehash(user.password):
+                await self._upgrade_password(user, password)
                 
             return user
             
         else:
             raise AuthenticationError(f"不支持的认证类型: {auth_type}", ErrorCode.AUTH_INVALID_TYPE)
         
+    async def _upgrade_password(self, user: User, password: str) -> None:
+        """重新计算并保存用户的密码哈希，失败时只记录日志，不影响本次登录"""
+        try:
+            password_hash = await hash_password_async(password)
+            if await asyncio.to_thread(self.db_ops.update_user_password, user.user_id, password_hash):
+                logger.info(f"用户 {user.user_id} 的密码已升级为哈希存储")
+        except Exception as e:
+            logger.error(f"升级用户 {user.user_id} 的密码哈希失败: {str(e)}")
+
     async def handle_authentication(self, websocket: ServerConnection) -> Tuple[User, str]:
         """处理用户认证流程
         
@@ -87,11 +109,13 @@ class AuthenticationHandler:
             AuthenticationError: 认证失败时抛出
             json.JSONDecodeError: JSON解析错误时抛出
         """
-        auth_msg = await asyncio.wait_for(websocket.recv(), timeout=10)
+        # asyncio.timeout 直接在当前任务上设置截止时间，不像 wait_for 那样额外包装一个任务
+        async with asyncio.timeout(10):
+            auth_msg = await websocket.recv()
         logger.info(f"获取到认证消息: {auth_msg}")
         
         try:
-            auth_data = json.loads(auth_msg)
+            auth_data = serialization.loads(auth_msg)
             user = await self.handle_auth(websocket, auth_data)
             return user, user.user_id
         except AuthenticationError as e:
@@ -102,12 +126,9 @@ class AuthenticationHandler:
             ))
             await websocket.close(code=1008, reason=str(e))
             raise
-        except json.JSONDecodeError as e:
+        except serialization.JSONDecodeError as e:
             logger.error(f"认证消息格式错误: {str(e)}", exc_info=True)
-            await websocket.send(MessageFormat.create_error_response(
-                "认证消息格式错误",
-                ErrorCode.AUTH_INVALID_FORMAT.value
-            ))
+            await websocket.send(_ERR_AUTH_INVALID_FORMAT)
             await websocket.close(code=1008, reason="认证消息格式错误")
             raise
             
@@ -135,31 +156,26 @@ class AuthenticationHandler:
             
             # 验证密码格式（至少8位，包含字母和数字）
             password = register_data["password"]
-            if len(password) < 8 or not any(c.isalpha() for c in password) or not any(c.isdigit() for c in password):
+            if not is_valid_password(password):
                 return False, {
                     "error": "密码必须至少8位，且包含字母和数字",
                     "code": ErrorCode.AUTH_INVALID_PASSWORD.value
                 }
             
-            # 检查用户名是否已存在
-            existing_user = self.db_ops.get_user_by_username(register_data["username"])
-            if existing_user:
-                return False, {
-                    "error": "该用户名已被注册",
-                    "code": ErrorCode.AUTH_USER_ALREADY_EXISTS.value
-                }
-            
             # 创建新用户
             user = User(
-                user_id=str(uuid.uuid4()),
+                user_id=uuid.uuid4().hex,
                 username=register_data["username"],
-                password=password,  # 注意：实际应用中应该对密码进行加密
+                password=await hash_password_async(password),
                 create_time=datetime.now(),
                 settings=None
             )
             
-            # 保存用户信息
-            success = self.db_ops.create_user(user)
+            # 保存用户信息（用户名重复由数据库唯一约束检查）
+            try:
+                success = await asyncio.to_thread(self.db_ops.create_user, user)
+            except DuplicateUserError:
+                raise AuthenticationError("该用户名已被注册", ErrorCode.AUTH_USER_ALREADY_EXISTS)
             if not success:
                 return False, {
                     "error": "用户注册失败",
@@ -173,6 +189,11 @@ class AuthenticationHandler:
                 "username": user.username
             }
             
+        except AuthenticationError as e:
+            return False, {
+                "error": str(e),
+                "code": e.error_code.value
+            }
         except Exception as e:
             logger.error(f"注册过程中发生错误: {str(e)}", exc_info=True)
             return False, {
@@ -193,12 +214,12 @@ class AuthenticationHandler:
             logger.info(f"服务器配置信息: {server}")
             
             # 更新用户服务器设置
-            success = self.db_ops.update_user_server(server, user_id)
+            success = await asyncio.to_thread(self.db_ops.update_user_server, server, user_id)
             
             if success:
                 logger.info(f"用户 {user_id} 的服务器设置已成功更新")
                 # 获取更新后的设置
-                user_settings = self.db_ops.get_user_settings(user_id)
+                user_settings = await asyncio.to_thread(self.db_ops.get_user_settings, user_id)
                 # 发送更新后的设置给用户
                 await websocket_manager.send_to_user(
                     user_id,
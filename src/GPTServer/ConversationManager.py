@@ -1,5 +1,5 @@
 import asyncio
-import json
+import dataclasses
 import logging
 from typing import Optional, List
 from datetime import datetime
@@ -8,33 +8,94 @@ import uuid
 import httpx
 from websockets import ServerConnection
 
-from src.interface import Messages
+from src.interface import Messages, serialization
 from src.interface.MCPServers import MCPServers
 from src.interface.MessageFormat import MessageFormat
 from src.interface.ErrorCode import ErrorCode
 from src.interface.GPTServerError import GPTServerError, ToolExecutionError, MessageProcessingError
 from src.database.models import User, Conversation, Message
 from src.database.operations import DatabaseOperations
+from src.database.cache import TTLCache
 from src.models.GPTModel import GPTModel
+from src.GPTServer.StreamBuffer import StreamBuffer
+from src.GPTServer.DatabaseWriter import DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
+# 标题生成完成前使用的占位标题
+DEFAULT_CONVERSATION_TITLE = "新对话"
+
 class ConversationManager:
     """对话管理器，处理对话相关的操作"""
     
-    def __init__(self, db_ops, model, websocket_manager, gpt_server):
+    def __init__(
+        self,
+        db_ops,
+        model,
+        websocket_manager,
+        gpt_server,
+        message_cache_size: int = 1000,
+        message_cache_ttl: float = 600
+    ):
         """初始化对话管理器
         
         Args:
             db_ops: 数据库操作实例
             model: GPT模型实例
             websocket_manager: WebSocket管理器实例
-            system_prompts: 系统提示词
+            gpt_server: GPTServer实例
+            message_cache_size (int): 缓存消息历史的最大对话数
+            message_cache_ttl (float): 消息历史缓存的有效期（秒）
         """
         self.db_ops = db_ops
         self.model = model
         self.websocket_manager = websocket_manager
         self.gpt_server = gpt_server
+        # 后台任务（如标题生成）的引用，防止任务在完成前被回收
+        self._background_tasks = set()
+        # 对话ID -> (用户ID, 消息历史)，写入数据库成功后同步追加，避免每轮回读完整历史；
+        # 缓存中的消息历史只在本类内追加，交给模型前复制一份，避免请求之间互相影响
+        self._message_cache = TTLCache(maxsize=message_cache_size, ttl=message_cache_ttl)
+        # 消息写入按对话排队在后台执行，不阻塞请求协程
+        self.db_writer = DatabaseWriter()
+
+    async def _load_messages(self, conversation_id: str, user_id: str) -> Messages:
+        """从数据库加载对话的消息历史并放入缓存"""
+        await self.db_writer.wait(conversation_id)
+        messages = await asyncio.to_thread(self.db_ops.get_message_list, conversation_id)
+        self._message_cache.set(conversation_id, (user_id, messages))
+        return messages
+
+    def _cached_messages(self, conversation_id: str) -> Optional[Messages]:
+        """返回缓存的消息历史，用于追加刚提交写入的消息"""
+        cached = self._message_cache.get(conversation_id)
+        return None if cached is None else cached[1]
+
+    def _write_messages(self, conversation_id: str, func, *args) -> asyncio.Task:
+        """在后台写入消息，写入失败时丢弃对话的消息历史缓存
+
+        写入按对话排队，之后的读取会先等待写入结束，请求协程无需等待写入结果。
+        """
+        write_task = self.db_writer.submit(conversation_id, func, *args, success=bool)
+        write_task.add_done_callback(
+            lambda task: self._drop_cache_if_failed(conversation_id, task)
+        )
+        return write_task
+
+    def _drop_cache_if_failed(self, conversation_id: str, write_task: asyncio.Task) -> None:
+        """后台写入失败时丢弃对话的消息历史缓存，下次从数据库重新加载"""
+        if write_task.cancelled() or write_task.exception() is not None or not write_task.result():
+            self._message_cache.pop(conversation_id)
+
+    def invalidate_user_messages(self, user_id: str) -> None:
+        """丢弃用户所有对话的消息历史缓存，用户登出时调用"""
+        self._message_cache.pop_matching(lambda cached: cached[0] == user_id)
+
+    async def close(self) -> None:
+        """释放对话管理器持有的资源"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.db_writer.close()
         
     async def answer_question_with_tools(
         self,
@@ -42,7 +103,8 @@ class ConversationManager:
         user_id: str,
         conversation_id: str,
         select_tools: List[dict],
-        mcp_server_list: Optional[MCPServers] = None
+        mcp_server_list: Optional[MCPServers] = None,
+        system_prompt: Optional[str] = None
     ) -> None:
         """使用工具回答问题"""
         try:
@@ -53,7 +115,9 @@ class ConversationManager:
                     "type": "function",
                     "function": {
                         "name": tool["name"],
-                        "arguments": tool["parameters"]
+                        # 数据库与模型接口要求arguments为JSON字符串，仅在参数为dict时才编码
+                        "arguments": tool["parameters"] if isinstance(tool["parameters"], str)
+                        else serialization.dumps(tool["parameters"])
                     }
                 }
                 for tool in select_tools
@@ -63,27 +127,77 @@ class ConversationManager:
 
             # 记录助手工具调用消息
             assistant_tool_message = Message(
-                message_id=str(uuid.uuid4()),
+                message_id=uuid.uuid4().hex,
                 role="assistant",
                 content=None,
                 created_time=datetime.now(),
                 tool_call_id=None,
-                tool_calls=json.dumps(gpt_tool_calls)
+                tool_calls=serialization.dumps(gpt_tool_calls)
             )
-            self.db_ops.create_message(assistant_tool_message, conversation_id)
 
-            # 处理工具调用
+            # 幂等服务器上的相同调用只执行一次，结果复用给其余重复的调用
+            idempotent_addresses = mcp_server_list.idempotent_addresses() if mcp_server_list else set()
+            unique_tools = {}
+            duplicate_ids = {}
             for select_tool in select_tools:
-                await self._process_tool_result(select_tool, conversation_id)
+                key = self._tool_call_key(select_tool, idempotent_addresses)
+                if key in unique_tools:
+                    duplicate_ids[unique_tools[key]["id"]].append(select_tool["id"])
+                else:
+                    unique_tools[key] = select_tool
+                    duplicate_ids[select_tool["id"]] = []
 
-            # 获取完整的消息历史
-            message = self.db_ops.get_message_list(conversation_id)
+            # 并发处理工具调用，每个工具完成后立即向用户推送进度
+            tasks = [
+                asyncio.create_task(self._process_tool_result(select_tool))
+                for select_tool in unique_tools.values()
+            ]
+            results = {}
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    tool_message = await next_done
+                    results[tool_message.tool_call_id] = tool_message
+                    for duplicate_id in duplicate_ids[tool_message.tool_call_id]:
+                        results[duplicate_id] = dataclasses.replace(
+                            tool_message,
+                            message_id=uuid.uuid4().hex,
+                            tool_call_id=duplicate_id
+                        )
+                    for tool_call_id in (tool_message.tool_call_id, *duplicate_ids[tool_message.tool_call_id]):
+                        await self.websocket_manager.send_to_user(
+                            user_id,
+                            MessageFormat.create_tool_progress_response(
+                                tool_call_id,
+                                tool_message.content
+                            )
+                        )
+            finally:
+                for task in tasks:
+                    task.cancel()
+            # 写入顺序与select_tools保持一致
+            tool_messages = [results[select_tool["id"]] for select_tool in select_tools]
+
+            # 助手工具调用消息与工具结果在一个事务中写入
+            self._write_messages(
+                conversation_id,
+                self.db_ops.create_messages,
+                [assistant_tool_message, *tool_messages],
+                conversation_id
+            )
 
+            # 获取完整的消息历史，缓存命中时直接追加本轮写入的消息
+            message = self._cached_messages(conversation_id)
+            if message is None:
+                message = await self._load_messages(conversation_id, user_id)
+            else:
+                message.add_assistant_tool_call_message(gpt_tool_calls)
+                for tool_message in tool_messages:
+                    message.add_tool_message(tool_message.tool_call_id, tool_message.content)
 
             logger.info(f"处理工具调用后的消息历史: {message.get_messages()}")
             
             # 继续对话
-            await self._answer_question(message, user_id, mcp_server_list, conversation_id)
+            await self._answer_question(message.copy(), user_id, mcp_server_list, conversation_id, system_prompt)
 
         except Exception as e:
             logger.error(f"处理带工具的问题时出错: {str(e)}")
@@ -102,62 +216,91 @@ class ConversationManager:
         messages = Messages()
         messages.add_system_message(conversation_title_propmt)
         messages.add_user_message(question)
-        response = self.model.chat_stream(messages=messages, tools=[], temperature=0)
-        full_response = ""
+        response = await self.model.chat_stream(messages=messages, tools=[], temperature=0)
+        response_parts: List[str] = []
+        buffer = StreamBuffer(
+            lambda text: self.websocket_manager.send_to_user(
+                user_id,
+                MessageFormat.create_conversation_title_response(conversation_id, text)
+            ),
+            max_chars=self.gpt_server.config.stream_flush_chars,
+            max_delay=self.gpt_server.config.stream_flush_interval
+        )
 
-        for chunk in response:
-            delta = chunk.choices[0].delta
-            if delta.content is not None:
-                full_response += chunk.choices[0].delta.content
-                await self.websocket_manager.send_to_user(
-                    user_id,
-                    MessageFormat.create_conversation_title_response(
-                        conversation_id,
-                        chunk.choices[0].delta.content
-                    )
-                )
-        return full_response
+        async for chunk in response:
+            content = chunk.choices[0].delta.content
+            if content is not None:
+                response_parts.append(content)
+                await buffer.append(content)
+        await buffer.flush()
+        return "".join(response_parts)
+
+    async def _update_conversation_title(self, question: str, user_id: str, conversation_id: str) -> None:
+        """生成对话标题并写入数据库"""
+        try:
+            title = await self.get_conversation_title(question, user_id, conversation_id)
+            await self.db_writer.submit(conversation_id, self.db_ops.update_conversation_title, conversation_id, title)
+        except Exception as e:
+            logger.error(f"生成对话标题时出错: {str(e)}", exc_info=True)
 
     async def answer_conversation_question(
         self,
         question: str,
         user_id: str,
-        mcp_server_list: Optional[MCPServers] = None
+        mcp_server_list: Optional[MCPServers] = None,
+        system_prompt: Optional[str] = None
     ) -> None:
         """回答对话问题"""
         try:
-            conversation_id = str(uuid.uuid4())
+            conversation_id = uuid.uuid4().hex
+            # 同一轮写入的对话和消息共用一个时间戳
+            now = datetime.now()
+            # 先以占位标题创建对话，标题在后台生成，不阻塞回答
             conversation = Conversation(
                 conversation_id=conversation_id,
-                title=await self.get_conversation_title(question, user_id, conversation_id),
-                create_time=datetime.now(),
-                update_time=datetime.now(),
+                title=DEFAULT_CONVERSATION_TITLE,
+                create_time=now,
+                update_time=now,
                 status="active"
             )
-            self.db_ops.create_conversation(conversation, user_id)
 
-            system_prompt = Message(
-                message_id=str(uuid.uuid4()),
+            system_message = Message(
+                message_id=uuid.uuid4().hex,
                 role="system",
-                content=self.gpt_server.system_prompts,
-                created_time=datetime.now(),
+                content=system_prompt,
+                created_time=now,
                 tool_call_id=None,
                 tool_calls=None
             )
-            self.db_ops.create_message(system_prompt, conversation_id)
             
             user_message = Message(
-                message_id=str(uuid.uuid4()),
+                message_id=uuid.uuid4().hex,
                 role="user",
                 content=question,
-                created_time=datetime.now(),
+                created_time=now,
                 tool_call_id=None,
                 tool_calls=None
             )
-            self.db_ops.create_message(user_message, conversation_id)
-            message = self.db_ops.get_conversation_messages(conversation_id)
+            # 对话、系统提示词和用户消息在一个事务中写入
+            self._write_messages(
+                conversation_id,
+                self.db_ops.create_conversation_with_messages,
+                conversation,
+                user_id,
+                [system_message, user_message]
+            )
+            title_task = asyncio.create_task(
+                self._update_conversation_title(question, user_id, conversation_id)
+            )
+            self._background_tasks.add(title_task)
+            title_task.add_done_callback(self._background_tasks.discard)
+            # 新对话只有刚写入的两条消息，直接在内存中构造，无需回读数据库
+            message = Messages()
+            message.add_system_message(system_message.content)
+            message.add_user_message(user_message.content)
+            self._message_cache.set(conversation_id, (user_id, message))
 
-            await self._answer_question(message, user_id, mcp_server_list, conversation_id)
+            await self._answer_question(message.copy(), user_id, mcp_server_list, conversation_id, system_prompt)
         except Exception as e:
             logger.error(f"处理问题时出错: {str(e)}")
             raise
@@ -166,10 +309,23 @@ class ConversationManager:
         self,
         conversation_id: str,
         user_id: str,
+        since_message_id: Optional[str] = None
     ) -> None:
-        """回答对话消息"""
+        """回答对话消息
+
+        指定 since_message_id 时只返回该消息之后的新消息，否则返回完整的消息记录；
+        since_message_id 不属于该对话时同样返回完整记录，响应中的 since_message_id 为空。
+        """
         try:
-            message = self.db_ops.get_message_list(conversation_id)
+            # 读取前等待本对话的后台写入完成，避免漏掉刚生成的回答
+            await self.db_writer.wait(conversation_id)
+            message, last_message_id, since_message_id = await asyncio.to_thread(
+                self.db_ops.get_messages_since,
+                conversation_id,
+                since_message_id
+            )
+            # 客户端重新拉取了消息记录，同时丢弃消息历史缓存，下一轮从数据库重新加载
+            self._message_cache.pop(conversation_id)
             # 删除消息列表中的系统消息，并且只保留用户消息和内容不为空的助手消息
             message.delete_system_message()
             message.filter_valid_conversation_messages()
@@ -179,7 +335,9 @@ class ConversationManager:
                 user_id,
                 MessageFormat.create_conversation_message_response(
                     conversation_id,
-                    message
+                    message,
+                    last_message_id=last_message_id,
+                    since_message_id=since_message_id
                 )
             )
         except Exception as e:
@@ -191,11 +349,12 @@ class ConversationManager:
         question: str,
         user_id: str,
         conversation_id: str,
-        mcp_server_list: Optional[MCPServers] = None
+        mcp_server_list: Optional[MCPServers] = None,
+        system_prompt: Optional[str] = None
     ) -> None:
         """回答问题"""
         try:
-            message_id = str(uuid.uuid4())
+            message_id = uuid.uuid4().hex
             user_message = Message(
                 message_id=message_id,
                 role="user",
@@ -204,19 +363,35 @@ class ConversationManager:
                 tool_call_id=None,
                 tool_calls=None
             )
-            self.db_ops.create_message(user_message, conversation_id)
+            # 排在本对话尚未完成的后台写入之后，保证消息的写入顺序
+            self._write_messages(conversation_id, self.db_ops.create_message, user_message, conversation_id)
 
-            message = self.db_ops.get_message_list(conversation_id)
+            message = self._cached_messages(conversation_id)
+            if message is None:
+                message = await self._load_messages(conversation_id, user_id)
+            else:
+                message.add_user_message(question)
 
             logger.info(f"message: {message.get_messages()}")
             
-            await self._answer_question(message, user_id, mcp_server_list, conversation_id)
+            await self._answer_question(message.copy(), user_id, mcp_server_list, conversation_id, system_prompt)
         except Exception as e:
             logger.error(f"处理问题时出错: {str(e)}")
             raise
 
-    async def _process_tool_result(self, select_tool: dict, conversation_id: str) -> None:
-        """处理工具调用结果"""
+    @staticmethod
+    def _tool_call_key(select_tool: dict, idempotent_addresses: set) -> tuple:
+        """生成工具调用的去重键，只有幂等服务器上的调用才按地址、函数名和参数去重"""
+        server_address = select_tool.get("server_address")
+        if server_address not in idempotent_addresses:
+            return ("id", select_tool.get("id"))
+        parameters = select_tool.get("parameters")
+        if not isinstance(parameters, str):
+            parameters = serialization.dumps(parameters)
+        return (server_address, select_tool.get("name"), parameters)
+
+    async def _process_tool_result(self, select_tool: dict) -> Message:
+        """处理工具调用结果，返回待写入的工具消息"""
         try:
             if not select_tool.get("id"):
                 raise ToolExecutionError("工具调用缺少id", ErrorCode.TOOL_MISSING_ID)
@@ -227,43 +402,46 @@ class ConversationManager:
             if not select_tool.get("server_address"):
                 raise ToolExecutionError("工具调用缺少server_address", ErrorCode.TOOL_MISSING_ADDRESS)
                 
+            # 参数已是dict时直接使用，避免重复解析
+            parameters = select_tool["parameters"]
             payload = MessageFormat.create_json_rpc_request(
                 id=select_tool["id"],
                 method=select_tool["name"],
-                params=json.loads(select_tool["parameters"])
+                params=parameters if isinstance(parameters, dict) else serialization.loads(parameters)
             )
             
-            async with httpx.AsyncClient() as client:
-                tool_result = await client.post(
+            # 使用服务器级共享的HTTP客户端，所有连接复用同一个连接池；
+            # 信号量限制所有连接合计同时进行中的工具调用数量
+            async with self.gpt_server.tool_semaphore:
+                tool_result = await self.gpt_server.http_client.post(
                     select_tool["server_address"],
                     headers={"Content-Type": "application/json"},
-                    timeout=10,
                     json=payload
                 )
-                
-                if tool_result.status_code != 200:
-                    raise ToolExecutionError(
-                        f"工具调用返回非200状态码: {tool_result.status_code}",
-                        ErrorCode.TOOL_HTTP_ERROR
-                    )
-                
-                # 解析JSON-RPC响应，只使用result字段
-                response_data = json.loads(tool_result.text)
-                if "result" not in response_data:
-                    raise ToolExecutionError("工具响应缺少result字段", ErrorCode.TOOL_EXECUTION_ERROR)
-                
-                # 创建工具消息
-                tool_message = Message(
-                    message_id=str(uuid.uuid4()),
-                    role="tool",
-                    content=json.dumps(response_data["result"]),
-                    created_time=datetime.now(),
-                    tool_call_id=select_tool["id"],  # 确保设置tool_call_id
-                    tool_calls=None
+            
+            if tool_result.status_code != 200:
+                raise ToolExecutionError(
+                    f"工具调用返回非200状态码: {tool_result.status_code}",
+                    ErrorCode.TOOL_HTTP_ERROR
                 )
-                self.db_ops.create_message(tool_message, conversation_id)
-                logger.debug(f"工具 {select_tool['name']} 调用成功")
-        except json.JSONDecodeError as e:
+            
+            # 解析JSON-RPC响应，只使用result字段
+            response_data = serialization.loads(tool_result.content)
+            if "result" not in response_data:
+                raise ToolExecutionError("工具响应缺少result字段", ErrorCode.TOOL_EXECUTION_ERROR)
+            
+            # 创建工具消息
+            tool_message = Message(
+                message_id=uuid.uuid4().hex,
+                role="tool",
+                content=serialization.dumps(response_data["result"]),
+                created_time=datetime.now(),
+                tool_call_id=select_tool["id"],  # 确保设置tool_call_id
+                tool_calls=None
+            )
+            logger.debug(f"工具 {select_tool['name']} 调用成功")
+            return tool_message
+        except serialization.JSONDecodeError as e:
             logger.error(f"工具参数JSON解析失败: {str(e)}", exc_info=True)
             raise ToolExecutionError("工具参数格式错误", ErrorCode.TOOL_PARAMS_FORMAT_ERROR)
         except httpx.TimeoutException as e:
@@ -278,45 +456,59 @@ class ConversationManager:
         messages: Messages,
         user_id: str,
         mcp_servers: Optional[MCPServers] = None,
-        conversation_id: str = None
+        conversation_id: str = None,
+        system_prompt: Optional[str] = None
     ) -> None:
-        """内部方法：处理问题回答"""
+        """内部方法：处理问题回答
+
+        system_prompt 为本次请求使用的系统提示词，不为空时替换消息历史中的系统消息。
+        """
         try:
-            available_functions = {}
-            tools = []
             print(messages.get_messages())
-            if messages.get_messages()[0]["role"] == "system":
-                messages.get_messages()[0]["content"] = self.gpt_server.system_prompts
-            if mcp_servers:
-                for mcp_server in mcp_servers.get_servers():
-                    tools.extend(mcp_server["server_functions"])
-                    for server_function in mcp_server["server_functions"]:
-                        available_functions[server_function["function"]["name"]] = mcp_server["server_address"]
-
-            chat_stream = self.model.chat_stream(messages=messages, tools=tools, temperature=0)
+            if system_prompt is not None and messages.get_messages()[0]["role"] == "system":
+                messages.get_messages()[0]["content"] = system_prompt
+            tools, available_functions = mcp_servers.compiled() if mcp_servers else ([], {})
+
+            chat_stream = await self.model.chat_stream(messages=messages, tools=tools, temperature=0)
             function_calls = []
-            full_response = ""
+            response_parts: List[str] = []
+            buffer = StreamBuffer(
+                lambda text: self.websocket_manager.send_to_user(
+                    user_id,
+                    MessageFormat.create_answer_response(text)
+                ),
+                max_chars=self.gpt_server.config.stream_flush_chars,
+                max_delay=self.gpt_server.config.stream_flush_interval
+            )
 
-            for chunk in chat_stream:
+            async for chunk in chat_stream:
+                # 热循环中将属性链绑定到局部变量，避免重复查找
                 delta = chunk.choices[0].delta
+                content = delta.content
+                tool_calls = delta.tool_calls
                 
-                if delta.content is not None:
-                    full_response += delta.content
-                    await self.websocket_manager.send_to_user(
-                        user_id,
-                        MessageFormat.create_answer_response(delta.content)
-                    )
+                if content is not None:
+                    response_parts.append(content)
+                    await buffer.append(content)
                 
-                if delta.tool_calls is not None:
-                    if delta.tool_calls[0].id is not None:
+                if tool_calls is not None:
+                    tool_call = tool_calls[0]
+                    function = tool_call.function
+                    if tool_call.id is not None:
+                        # 参数片段先收集到列表中，流结束后再拼接
                         function_calls.append({
-                            "id": delta.tool_calls[0].id,
-                            "name": delta.tool_calls[0].function.name,
-                            "parameters": delta.tool_calls[0].function.arguments,
-                            "server_address": available_functions[delta.tool_calls[0].function.name]
+                            "id": tool_call.id,
+                            "name": function.name,
+                            "parameters": [function.arguments],
+                            "server_address": available_functions[function.name]
                         })
                     else:
-                        function_calls[-1]["parameters"] += delta.tool_calls[0].function.arguments
+                        function_calls[-1]["parameters"].append(function.arguments)
+
+            await buffer.flush()
+
+            for function_call in function_calls:
+                function_call["parameters"] = "".join(function_call["parameters"])
 
             if function_calls:
                 await self.websocket_manager.send_to_user(
@@ -325,15 +517,25 @@ class ConversationManager:
                 )
             else:
                 # 记录助手消息
+                answer = "".join(response_parts)
                 assistant_message = Message(
-                    message_id=str(uuid.uuid4()),
+                    message_id=uuid.uuid4().hex,
                     role="assistant",
-                    content=full_response,
+                    content=answer,
                     created_time=datetime.now(),
                     tool_calls=None,
                     tool_call_id=None
                 )
-                self.db_ops.create_message(assistant_message, conversation_id)
+                # 回答已发送给用户，助手消息在后台写入，写入失败时丢弃消息历史缓存
+                cached_messages = self._cached_messages(conversation_id)
+                if cached_messages is not None:
+                    cached_messages.add_assistant_message(answer)
+                self._write_messages(
+                    conversation_id,
+                    self.db_ops.create_message,
+                    assistant_message,
+                    conversation_id
+                )
                 
         except Exception as e:
             error_msg = f"服务器处理GPT回答时出错: {str(e)}"
@@ -351,15 +553,16 @@ class ConversationManager:
             GPTServerError: 删除失败时抛出
         """
         try:
-            # 检查对话是否存在
-            conversation = self.db_ops.get_conversation(conversation_id)
-            if not conversation:
-                raise GPTServerError("对话不存在", ErrorCode.SERVER_INTERNAL_ERROR)
-            
-            # 删除对话及其所有消息
-            success = self.db_ops.delete_conversation(conversation_id)
+            # 删除对话及其所有消息，对话不存在时影响行数为0
+            success = await self.db_writer.submit(
+                conversation_id,
+                self.db_ops.delete_conversation,
+                conversation_id,
+                retries=0
+            )
+            self._message_cache.pop(conversation_id)
             if not success:
-                raise GPTServerError("删除对话失败", ErrorCode.SERVER_INTERNAL_ERROR)
+                raise GPTServerError("对话不存在或删除失败", ErrorCode.SERVER_INTERNAL_ERROR)
                 
             logger.info(f"成功删除对话 {conversation_id}")
 
@@ -383,7 +586,7 @@ class ConversationManager:
         """
         try:
             # 获取用户的对话列表
-            conversations = self.db_ops.get_user_conversations(user_id)
+            conversations = await asyncio.to_thread(self.db_ops.get_user_conversations, user_id)
             if conversations is None:
                 raise GPTServerError("获取对话列表失败", ErrorCode.SERVER_INTERNAL_ERROR)
                 
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """后台数据库写入器
+
+    写入在线程中执行，不占用请求协程；同一个键（如对话ID）的写入按提交顺序依次执行，
+    不同键之间互不等待。数据库操作抛出异常时按配置重试，调用方也可以传入判断返回值的
+    success 函数，返回值不满足时同样重试。
+    """
+
+    def __init__(self, retries: int = 2, retry_delay: float = 0.5):
+        """初始化写入器
+
+        Args:
+            retries (int): 写入失败后的重试次数
+            retry_delay (float): 两次重试之间的间隔（秒）
+        """
+        self._retries = retries
+        self._retry_delay = retry_delay
+        # 每个键最后提交的写入任务，新的写入排在它之后
+        self._tails: Dict[Hashable, asyncio.Task] = {}
+
+    def submit(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        *args,
+        retries: Optional[int] = None,
+        success: Optional[Callable[[Any], bool]] = None
+    ) -> asyncio.Task:
+        """提交一次写入
+
+        返回的任务可以直接丢弃（后台写入），需要写入结果时 await 该任务即可。
+
+        Args:
+            key (Hashable): 写入顺序键，相同键的写入依次执行
+            func (Callable[..., Any]): 同步的数据库操作
+            *args: 数据库操作的参数
+            retries (Optional[int]): 本次写入的重试次数，为None时使用写入器的配置
+            success (Optional[Callable[[Any], bool]]): 根据返回值判断写入是否成功，
+                为None时只在抛出异常时重试
+
+        Returns:
+            asyncio.Task: 写入任务，结果为数据库操作的返回值
+        """
+        if retries is None:
+            retries = self._retries
+        task = asyncio.create_task(self._run(self._tails.get(key), func, args, retries, success))
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._release(key, done))
+        return task
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"数据库写入失败: {task.exception()}")
+
+    async def wait(self, key: Hashable) -> None:
+        """等待指定键已提交的写入全部结束，用于读取前保证能读到这些写入"""
+        tail = self._tails.get(key)
+        if tail is not None:
+            await asyncio.wait([tail])
+
+    async def _run(
+        self,
+        previous: Optional[asyncio.Task],
+        func: Callable[..., Any],
+        args: tuple,
+        retries: int,
+        success: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        if previous is not None:
+            # 只等待前一次写入结束，不关心它是否成功
+            await asyncio.wait([previous])
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(self._retry_delay)
+            try:
+                result = await asyncio.to_thread(func, *args)
+            except Exception:
+                if attempt == retries:
+                    raise
+                continue
+            if success is None or success(result):
+                return result
+        if retries:
+            logger.warning(f"数据库写入 {getattr(func, '__name__', func)} 重试 {retries} 次后仍然失败")
+        return result
+
+    async def close(self) -> None:
+        """等待所有已提交的写入完成"""
+        if self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
@@ -1,8 +1,16 @@
 import asyncio
 import logging
+from typing import Optional
 
+import httpx
 import websockets
+
+try:
+    import uvloop
+except ImportError:  # Windows等平台没有uvloop时使用默认事件循环
+    uvloop = None
 from websockets import serve, ServerConnection
+from websockets.protocol import State
 
 from src.models.GPTModel import GPTModel
 from src.GPTServer.HeartbeatManager import HeartbeatManager
@@ -11,7 +19,7 @@ from src.GPTServer.ConversationManager import ConversationManager
 from src.interface.MessageFormat import MessageFormat
 from src.interface.ErrorCode import ErrorCode
 from src.interface.GPTServerError import GPTServerError, AuthenticationError, MessageProcessingError, ToolExecutionError
-from src.config.GPTConfig import GPTConfig
+from src.config.GPTConfig import GPTConfig, get_config
 from src.database.base import Database
 from src.database.operations import DatabaseOperations
 from src.database.models import User, Conversation, Message, ConversationMessage, ToolCall, MessageToolCall
@@ -25,12 +33,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 固定内容的错误响应，导入时序列化并编码为UTF-8一次
+# 发送时指定 text=True，仍以文本帧发送，websockets不再重复编码
+_ERR_AUTH_TIMEOUT = MessageFormat.create_error_response("认证超时", ErrorCode.AUTH_TIMEOUT.value).encode()
+_ERR_INTERNAL = MessageFormat.create_error_response("服务器内部错误", ErrorCode.SERVER_INTERNAL_ERROR.value).encode()
+
+async def _safe_send(websocket: ServerConnection, message: bytes) -> None:
+    """连接仍处于打开状态时发送文本帧，发送途中连接断开则忽略"""
+    if websocket.state is not State.OPEN:
+        return
+    try:
+        await websocket.send(message, text=True)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
 class GPTServer:
     """GPT服务器类，处理WebSocket连接和消息处理"""
     
     # 类属性
     websocket_manager = WebsocketManager()
-    config = GPTConfig()
+    config: GPTConfig = get_config()
     
     # 数据库配置
     db = Database(
@@ -38,7 +60,8 @@ class GPTServer:
         port=config.db_port,
         user=config.db_user,
         password=config.db_password,
-        database=config.db_name
+        database=config.db_name,
+        pool_size=config.db_pool_size
     )
     db_ops = DatabaseOperations(db)
     
@@ -49,9 +72,10 @@ class GPTServer:
         model=config.model
     )
     
-    system_prompts: str
-
-    
+    # 工具调用共享的HTTP客户端，在 start_server 中创建，复用keep-alive连接
+    http_client: Optional[httpx.AsyncClient] = None
+    # 限制同时进行中的工具调用数量，在 start_server 中创建
+    tool_semaphore: Optional[asyncio.Semaphore] = None
 
     def __init__(self):
         """初始化GPTServer"""
@@ -69,18 +93,14 @@ class GPTServer:
         user_id = None
         heartbeat_manager = None
         heartbeat_task = None
-        gpt_server = GPTServer()  # 创建 GPTServer 实例
-        message_handler = MessageHandler(gpt_server)
-        auth_handler = AuthenticationHandler(GPTServer.db_ops)
+        message_handler = _message_handler
+        auth_handler = _auth_handler
 
         try:
             # 1. 处理认证
             user, user_id = await auth_handler.handle_authentication(websocket)
             
-            # 2. 发送初始数据
-            await message_handler.send_initial_data(websocket, user_id)
-            
-            # 3. 设置心跳管理
+            # 2. 设置心跳管理
             heartbeat_manager = HeartbeatManager(
                 websocket=websocket,
                 user_id=user_id,
@@ -89,8 +109,11 @@ class GPTServer:
             )
             heartbeat_task = asyncio.create_task(heartbeat_manager.start())
             
-            # 4. 注册连接到连接池
-            await GPTServer.websocket_manager.add_connection(user_id, websocket)
+            # 3. 注册连接到连接池
+            GPTServer.websocket_manager.add_connection(user_id, websocket)
+
+            # 4. 发送初始数据，心跳在此期间已经开始运行
+            await message_handler.send_initial_data(websocket, user_id)
 
             # 5. 主消息循环
             async for message in websocket:
@@ -101,23 +124,14 @@ class GPTServer:
 
         except asyncio.TimeoutError:
             logger.error("认证超时")
-            await websocket.send(MessageFormat.create_error_response(
-                "认证超时",
-                ErrorCode.AUTH_TIMEOUT.value
-            ))
+            await _safe_send(websocket, _ERR_AUTH_TIMEOUT)
             await websocket.close(code=1008, reason="认证超时")
         except websockets.exceptions.ConnectionClosed:
+            # 对端已断开，不再发送错误消息
             logger.warning(f"用户 {user_id} 连接丢失")
-            await websocket.send(MessageFormat.create_error_response(
-                "连接已关闭",
-                ErrorCode.SERVER_CONNECTION_ERROR.value
-            ))
         except Exception as e:
             logger.error(f"处理连接时发生错误: {str(e)}", exc_info=True)
-            await websocket.send(MessageFormat.create_error_response(
-                "服务器内部错误",
-                ErrorCode.SERVER_INTERNAL_ERROR.value
-            ))
+            await _safe_send(websocket, _ERR_INTERNAL)
             await websocket.close(code=1011, reason="服务器内部错误")
         finally:
             # 6. 清理资源
@@ -130,13 +144,40 @@ class GPTServer:
                 except asyncio.CancelledError:
                     pass
             if user_id:
-                await GPTServer.websocket_manager.remove_connection(user_id)
+                GPTServer.websocket_manager.remove_connection(user_id, websocket)
+
+# 处理器不保存连接相关的状态，所有连接共享同一组实例
+_gpt_server = GPTServer()
+_message_handler = MessageHandler(_gpt_server)
+_auth_handler = AuthenticationHandler(GPTServer.db_ops)
 
 async def start_server(handler):
-    config = GPTConfig()
+    config = get_config()
+
+    # 消息的排序和增量查询依赖 conversation_messages.seq，旧数据库在启动时自动补齐
+    await asyncio.to_thread(GPTServer.db_ops.migrate_conversation_message_seq)
+
+    # 在事件循环内创建共享HTTP客户端
+    # 启用HTTP/2，对同一工具服务器的并发调用复用一条连接
+    GPTServer.http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        limits=httpx.Limits(max_keepalive_connections=128, max_connections=512)
+    )
+    GPTServer.tool_semaphore = asyncio.Semaphore(config.tool_concurrency)
     
     # 启动 WebSocket 服务器
-    ws_server = await serve(handler, config.server_host, config.server_port)
+    # 关闭permessage-deflate：流式回答的小帧压缩收益很小，且每个连接都要保留一份zlib上下文
+    # 关闭协议层ping：HeartbeatManager已经在应用层做心跳检测，无需每个连接再运行一个ping任务
+    ws_server = await serve(
+        handler,
+        config.server_host,
+        config.server_port,
+        compression=None,
+        ping_interval=None,
+        max_size=config.ws_max_message_size,
+        server_header=None
+    )
     logger.info(f"WebSocket服务器启动在 {config.server_host}:{config.server_port}")
     
     try:
@@ -146,7 +187,16 @@ async def start_server(handler):
         # 清理资源
         ws_server.close()
         await ws_server.wait_closed()
+    finally:
+        await _gpt_server.conversation_manager.close()
+        await GPTServer.http_client.aclose()
+
+def run_event_loop(main):
+    """运行协程直到结束，uvloop可用时使用uvloop事件循环"""
+    if uvloop is not None:
+        return uvloop.run(main)
+    return asyncio.run(main)
 
 if __name__ == "__main__":
-    asyncio.run(start_server(GPTServer.handler))
+    run_event_loop(start_server(GPTServer.handler))
 
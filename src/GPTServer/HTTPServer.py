@@ -1,47 +1,54 @@
+import asyncio
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Tuple, List
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from src.GPTServer.KnowledgeBaseManager import KnowledgeBaseManager
-from src.database.operations import DatabaseOperations
-from src.database.base import Database
+from src.GPTServer.KnowledgeBaseManager import ALLOWED_FILE_EXTENSIONS, KnowledgeBaseManager, get_knowledge_base_manager
 from src.interface.EnumModel import EnumModel
 from src.interface.ErrorCode import ErrorCode
+from src.interface.GPTServerError import AuthenticationError
 from src.database.models import User
+from src.database.operations import DuplicateUserError
 from src.GPTServer.GPTServer import GPTServer
+from src.GPTServer.PasswordHasher import hash_password_async, is_valid_password
 from datetime import datetime
 import uuid
 import os
 
-from src.models.GPTModel import GPTModel
-from src.config.GPTConfig import GPTConfig
+from src.config.GPTConfig import get_config
 
 logger = logging.getLogger(__name__)
 
 # 创建配置实例
-config = GPTConfig()
+config = get_config()
 
 # 创建 FastAPI 应用
 app = FastAPI(
     title="GPT Server API",
     description="GPT服务器的HTTP API接口",
-    version="1.0.0"
+    version="1.0.0",
+    # 使用orjson序列化响应，datetime等类型由orjson原生处理
+    default_response_class=ORJSONResponse
 )
 
-# 配置 CORS
+# 配置 CORS，只放行接口实际用到的方法和头部
+# 接口不依赖Cookie，仅在配置了明确来源时才允许携带凭据，避免通配来源下回显任意Origin
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # 允许所有来源
-    allow_credentials=True,
-    allow_methods=["*"],  # 允许所有方法
-    allow_headers=["*"],  # 允许所有头部
+    allow_origins=config.cors_origins,
+    allow_credentials="*" not in config.cors_origins,
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Content-Type"],
 )
 
 # 请求模型
 class RegisterRequest(BaseModel):
-    username: str = Field(..., description="用户名")
-    password: str = Field(..., description="密码，至少8位，包含字母和数字")
+    username: str = Field(..., min_length=1, description="用户名")
+    password: str = Field(..., min_length=1, description="密码，至少8位，包含字母和数字")
 
 # 响应模型
 class RegisterResponse(BaseModel):
@@ -77,76 +84,59 @@ class KnowledgeBaseFileResponse(BaseModel):
 class KnowledgeBaseFileListResponse(BaseModel):
     files: List[KnowledgeBaseFileResponse] = Field(..., description="文件列表")
 
-# 全局服务实例
-knowledge_base_service = KnowledgeBaseManager(
-    db_ops=DatabaseOperations(
-        Database(
-            config.db_host,
-            config.db_port,
-            config.db_user,
-            config.db_password,
-            config.db_name
-        )
-    ),
-    model=GPTModel(config.base_url,
-                   config.api_key,
-                   config.model
-                   )
-)
+# 错误响应用到的错误码
+_INTERNAL_ERROR_CODE = ErrorCode.SERVER_INTERNAL_ERROR.value
+_INVALID_PARAMETER_CODE = ErrorCode.INVALID_PARAMETER.value
+
+def _error_detail(code: int, message: str) -> Dict[str, Any]:
+    """构造HTTPException的错误详情"""
+    return {"type": "error", "code": code, "message": message}
 
-async def handle_register(register_data: dict) -> Tuple[bool, dict]:
+# 内容固定的错误详情只构造一次，各请求共用（只读，不要修改）
+_KNOWLEDGE_BASE_NOT_FOUND_DETAIL = _error_detail(_INTERNAL_ERROR_CODE, "知识库不存在")
+_FILE_NOT_FOUND_DETAIL = _error_detail(_INTERNAL_ERROR_CODE, "文件不存在")
+
+@lru_cache(maxsize=None)
+def get_knowledge_base_service() -> KnowledgeBaseManager:
+    """知识库服务，首次请求时创建，与WebSocket消息处理共用同一个管理器"""
+    return get_knowledge_base_manager(GPTServer.db_ops, GPTServer.model)
+
+async def handle_register(register_data: RegisterRequest) -> Tuple[bool, dict]:
     """处理用户注册
     
     Args:
-        register_data (dict): 注册数据
+        register_data (RegisterRequest): 注册数据，必填字段已由模型校验
         
     Returns:
         Tuple[bool, dict]: (是否成功, 响应数据)
     """
     try:
-        # 验证必填字段
-        if not register_data.get("username"):
-            return False, {
-                "error": "注册消息中缺少username",
-                "code": ErrorCode.AUTH_INVALID_USERNAME.value
-            }
-        if not register_data.get("password"):
-            return False, {
-                "error": "注册消息中缺少password",
-                "code": ErrorCode.AUTH_MISSING_PASSWORD.value
-            }
-        
         # 验证密码格式（至少8位，包含字母和数字）
-        password = register_data["password"]
-        if len(password) < 8 or not any(c.isalpha() for c in password) or not any(c.isdigit() for c in password):
+        password = register_data.password
+        if not is_valid_password(password):
             return False, {
                 "error": "密码必须至少8位，且包含字母和数字",
                 "code": ErrorCode.AUTH_INVALID_PASSWORD.value
             }
         
-        # 检查用户名是否已存在
-        existing_user = GPTServer.db_ops.get_user_by_username(register_data["username"])
-        if existing_user:
-            return False, {
-                "error": "该用户名已被注册",
-                "code": ErrorCode.AUTH_USER_ALREADY_EXISTS.value
-            }
-        
         # 创建新用户
         user = User(
-            user_id=str(uuid.uuid4()),
-            username=register_data["username"],
-            password=password,  # 注意：实际应用中应该对密码进行加密
+            user_id=uuid.uuid4().hex,
+            username=register_data.username,
+            password=await hash_password_async(password),
             create_time=datetime.now(),
             settings=None
         )
         
-        # 保存用户信息
-        success = GPTServer.db_ops.create_user(user)
+        # 保存用户信息（用户名重复由数据库唯一约束检查）
+        try:
+            success = await asyncio.to_thread(GPTServer.db_ops.create_user, user)
+        except DuplicateUserError:
+            raise AuthenticationError("该用户名已被注册", ErrorCode.AUTH_USER_ALREADY_EXISTS)
         if not success:
             return False, {
                 "error": "用户注册失败",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value
+                "code": _INTERNAL_ERROR_CODE
             }
         
         logger.info(f"用户 {user.user_id} 注册成功")
@@ -156,11 +146,16 @@ async def handle_register(register_data: dict) -> Tuple[bool, dict]:
             "username": user.username
         }
         
+    except AuthenticationError as e:
+        return False, {
+            "error": str(e),
+            "code": e.error_code.value
+        }
     except Exception as e:
         logger.error(f"注册过程中发生错误: {str(e)}", exc_info=True)
         return False, {
             "error": "注册失败",
-            "code": ErrorCode.SERVER_INTERNAL_ERROR.value
+            "code": _INTERNAL_ERROR_CODE
         }
 
 @app.post("/api/register", 
@@ -175,7 +170,7 @@ async def handle_register(register_data: dict) -> Tuple[bool, dict]:
 async def register(request: RegisterRequest) -> Dict[str, Any]:
     """处理注册请求"""
     # 调用注册处理方法
-    success, response = await handle_register(request.dict())
+    success, response = await handle_register(request)
 
     if success:
         return {
@@ -183,14 +178,7 @@ async def register(request: RegisterRequest) -> Dict[str, Any]:
             **response
         }
     else:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "type": "error",
-                "code": response["code"],
-                "message": response["error"]
-            }
-        )
+        raise HTTPException(status_code=400, detail=_error_detail(response["code"], response["error"]))
 
 @app.post("/api/knowledge-base", 
     response_model=KnowledgeBaseResponse,
@@ -201,10 +189,17 @@ async def register(request: RegisterRequest) -> Dict[str, Any]:
     summary="创建知识库",
     description="创建新的知识库"
 )
-async def create_knowledge_base(request: CreateKnowledgeBaseRequest) -> Dict[str, Any]:
+async def create_knowledge_base(
+    request: CreateKnowledgeBaseRequest,
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
+) -> Dict[str, Any]:
     """创建知识库"""
     try:
-        kb_id, title = knowledge_base_service.create_knowledge_base(request.user_id,request.title)
+        kb_id, title = await asyncio.to_thread(
+            knowledge_base_service.create_knowledge_base,
+            request.user_id,
+            request.title
+        )
         return {
             "kb_id": kb_id,
             "title": title,
@@ -212,89 +207,64 @@ async def create_knowledge_base(request: CreateKnowledgeBaseRequest) -> Dict[str
         }
     except Exception as e:
         logger.error(f"创建知识库失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
 
+# 列表接口直接返回ORJSONResponse，跳过按response_model逐行校验和转换；模型只用于生成文档
 @app.get("/api/knowledge-base", 
-    response_model=KnowledgeBaseListResponse,
+    response_model=None,
     responses={
+        200: {"model": KnowledgeBaseListResponse, "description": "知识库列表"},
         500: {"model": ErrorResponse, "description": "服务器内部错误"}
     },
     summary="获取知识库列表",
     description="获取用户的所有知识库"
 )
-async def get_knowledge_bases(user_id: str) -> Dict[str, Any]:
+async def get_knowledge_bases(
+    user_id: str,
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
+) -> ORJSONResponse:
     """获取知识库列表"""
     try:
-        knowledge_bases = knowledge_base_service.get_user_knowledge_bases(user_id)
-        return {
-            "knowledge_bases": [
-                {
-                    "kb_id": kb.kb_id,
-                    "title": kb.title,
-                    "created_time": kb.created_time
-                }
-                for kb in knowledge_bases
-            ]
-        }
+        # 查询结果行的列与响应字段一致，直接交给orjson序列化
+        knowledge_bases = await asyncio.to_thread(knowledge_base_service.get_user_knowledge_bases, user_id)
+        return ORJSONResponse({"knowledge_bases": knowledge_bases})
     except Exception as e:
         logger.error(f"获取知识库列表失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
 
 @app.get("/api/knowledge-base/{kb_id}/files", 
-    response_model=KnowledgeBaseFileListResponse,
+    response_model=None,
     responses={
+        200: {"model": KnowledgeBaseFileListResponse, "description": "文件列表"},
         404: {"model": ErrorResponse, "description": "知识库不存在"},
         500: {"model": ErrorResponse, "description": "服务器内部错误"}
     },
     summary="获取知识库文件列表",
     description="获取指定知识库中的所有文件"
 )
-async def get_knowledge_base_files(kb_id: str) -> Dict[str, Any]:
+async def get_knowledge_base_files(
+    kb_id: str,
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
+) -> ORJSONResponse:
     """获取知识库文件列表"""
     try:
-        files = knowledge_base_service.get_knowledge_base_files(kb_id)
-        return {
-            "files": [
-                {
-                    "file_id": file.file_id,
-                    "file_name": file.file_name,
-                    "file_path": file.file_path,
-                    "summary": file.summary,
-                    "created_time": file.created_time
-                }
-                for file in files
-            ]
-        }
+        # 查询结果行的列与响应字段一致，直接交给orjson序列化
+        files = await asyncio.to_thread(knowledge_base_service.get_knowledge_base_files, kb_id)
+        if files is None:
+            raise HTTPException(status_code=404, detail=_KNOWLEDGE_BASE_NOT_FOUND_DETAIL)
+        return ORJSONResponse({"files": files})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取知识库文件列表失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
 
 @app.post("/api/knowledge-base/{kb_id}/files", 
     response_model=KnowledgeBaseFileResponse,
     responses={
         404: {"model": ErrorResponse, "description": "知识库不存在"},
         400: {"model": ErrorResponse, "description": "文件格式错误"},
+        413: {"model": ErrorResponse, "description": "文件过大"},
         500: {"model": ErrorResponse, "description": "服务器内部错误"}
     },
     summary="上传文件到知识库",
@@ -303,20 +273,23 @@ async def get_knowledge_base_files(kb_id: str) -> Dict[str, Any]:
 async def upload_knowledge_file(
     kb_id: str,
     file: UploadFile = File(...),
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
 ) -> Dict[str, Any]:
     """上传文件到知识库"""
     try:
         # 检查文件类型
-        allowed_types = ['.txt', '.md', '.pdf', '.doc', '.docx']
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_types:
+        if file_ext not in ALLOWED_FILE_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail={
-                    "type": "error",
-                    "code": ErrorCode.INVALID_PARAMETER.value,
-                    "message": f"不支持的文件类型: {file_ext}"
-                }
+                detail=_error_detail(_INVALID_PARAMETER_CODE, f"不支持的文件类型: {file_ext}")
+            )
+
+        # 大小已知时提前拒绝过大的文件；未知时由保存文件时的计数兜底
+        if file.size is not None and file.size > config.upload_max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=_error_detail(_INVALID_PARAMETER_CODE, f"文件大小超过上限 {config.upload_max_bytes} 字节")
             )
 
         result = await knowledge_base_service.update_file_to_knowledge_base(kb_id, file)
@@ -325,14 +298,7 @@ async def upload_knowledge_file(
         raise
     except Exception as e:
         logger.error(f"上传文件到知识库失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
 
 @app.delete("/api/knowledge-base/{kb_id}", 
     responses={
@@ -342,21 +308,17 @@ async def upload_knowledge_file(
     summary="删除知识库",
     description="删除指定的知识库及其所有文件"
 )
-async def delete_knowledge_base(kb_id: str) -> Dict[str, Any]:
+async def delete_knowledge_base(
+    kb_id: str,
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
+) -> Dict[str, Any]:
     """删除知识库"""
     try:
-        knowledge_base_service.delete_knowledge_base(kb_id)
+        await asyncio.to_thread(knowledge_base_service.delete_knowledge_base, kb_id)
         return {"message": "知识库删除成功"}
     except Exception as e:
         logger.error(f"删除知识库失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
 
 @app.delete("/api/knowledge-base/{kb_id}/files/{file_id}",
     responses={
@@ -366,53 +328,61 @@ async def delete_knowledge_base(kb_id: str) -> Dict[str, Any]:
     summary="删除知识库文件",
     description="删除指定的知识库文件"
 )
-async def delete_knowledge_file(kb_id: str, file_id: str) -> Dict[str, Any]:
+async def delete_knowledge_file(
+    kb_id: str,
+    file_id: str,
+    knowledge_base_service: KnowledgeBaseManager = Depends(get_knowledge_base_service)
+) -> Dict[str, Any]:
     """删除知识库文件"""
     try:
         # 检查知识库是否存在
-        knowledge_base = knowledge_base_service.db_ops.get_knowledge_base(kb_id)
+        knowledge_base = await asyncio.to_thread(knowledge_base_service.db_ops.get_knowledge_base, kb_id)
         if not knowledge_base:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "error",
-                    "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                    "message": "知识库不存在"
-                }
-            )
+            raise HTTPException(status_code=404, detail=_KNOWLEDGE_BASE_NOT_FOUND_DETAIL)
 
         # 检查文件是否存在
-        file = knowledge_base_service.db_ops.get_knowledge_base_file(file_id)
+        file = await asyncio.to_thread(knowledge_base_service.db_ops.get_knowledge_base_file, file_id)
         if not file:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "error",
-                    "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                    "message": "文件不存在"
-                }
-            )
+            raise HTTPException(status_code=404, detail=_FILE_NOT_FOUND_DETAIL)
 
-        knowledge_base_service.delete_knowledge_base_file(kb_id, file_id)
+        await asyncio.to_thread(knowledge_base_service.delete_knowledge_base_file, kb_id, file_id)
         return {"message": "文件删除成功"}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"删除知识库文件失败: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "type": "error",
-                "code": ErrorCode.SERVER_INTERNAL_ERROR.value,
-                "message": str(e)
-            }
-        )
+        raise HTTPException(status_code=500, detail=_error_detail(_INTERNAL_ERROR_CODE, str(e)))
+
+# HTTP服务器配置：uvloop/httptools可用时自动使用，关闭逐请求的访问日志
+_UVICORN_OPTIONS = {
+    "host": config.http_host,
+    "port": config.http_port,
+    "http": "auto",
+    "loop": "auto",
+    "access_log": False
+}
+
+def _uvicorn_config() -> uvicorn.Config:
+    """单进程运行时的uvicorn配置"""
+    return uvicorn.Config(app, **_UVICORN_OPTIONS)
 
 def start_http_server():
-    """启动HTTP服务器"""
-    import uvicorn
+    """启动HTTP服务器
+
+    配置了多个工作进程时，以导入字符串的方式交给uvicorn启动多进程，
+    各进程共享同一个监听套接字，由内核分配连接。
+    """
+    logger.info(f"HTTP服务器启动在 {config.http_host}:{config.http_port}，工作进程数 {config.http_workers}")
+    if config.http_workers > 1:
+        uvicorn.run("src.GPTServer.HTTPServer:app", workers=config.http_workers, **_UVICORN_OPTIONS)
+    else:
+        uvicorn.Server(_uvicorn_config()).run()
+
+async def serve_http_server():
+    """在当前事件循环中运行HTTP服务器，可与WebSocket服务器共用同一个事件循环"""
+    server = uvicorn.Server(_uvicorn_config())
     logger.info(f"HTTP服务器启动在 {config.http_host}:{config.http_port}")
-    uvicorn.run(app, host=config.http_host, port=config.http_port)
+    await server.serve()
 
 if __name__ == "__main__":
     # 配置日志
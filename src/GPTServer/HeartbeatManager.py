@@ -1,6 +1,5 @@
 import asyncio
 import websockets
-import json
 import logging
 from typing import Optional
 from src.interface.MessageFormat import MessageFormat
@@ -8,6 +7,15 @@ from src.interface.ErrorCode import ErrorCode
 
 logger = logging.getLogger(__name__)
 
+# 心跳确认消息的最大长度，超过该长度的消息不可能是心跳确认
+MAX_HEARTBEAT_ACK_LENGTH = 256
+
+# 固定内容的错误响应，导入时序列化一次
+_ERR_HEARTBEAT_SEND_FAILED = MessageFormat.create_error_response("心跳消息发送失败", ErrorCode.SERVER_INTERNAL_ERROR.value)
+_ERR_HEARTBEAT_TIMEOUT = MessageFormat.create_error_response("心跳超时", ErrorCode.HEARTBEAT_TIMEOUT.value)
+_ERR_HEARTBEAT_MAX_RETRIES = MessageFormat.create_error_response("心跳失败，达到最大重试次数", ErrorCode.HEARTBEAT_MAX_RETRIES.value)
+_ERR_HEARTBEAT_ERROR = MessageFormat.create_error_response("心跳检测发生错误", ErrorCode.SERVER_INTERNAL_ERROR.value)
+
 class HeartbeatManager:
     def __init__(
         self,
@@ -25,8 +33,11 @@ class HeartbeatManager:
         self.retry_count = 0
         self.is_running = True
         self.last_heartbeat_time: Optional[float] = None
-        self.heartbeat_received = False
+        # 收到心跳确认时置位，发送新的心跳前清除
+        self._ack_event = asyncio.Event()
         self._heartbeat_task: Optional[asyncio.Task] = None
+        # 运行心跳的事件循环，在 start 中获取
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
     async def handle_heartbeat_failure(self) -> None:
         """处理心跳失败"""
@@ -36,45 +47,40 @@ class HeartbeatManager:
     async def send_heartbeat(self) -> None:
         """发送心跳消息"""
         try:
-            timestamp = asyncio.get_event_loop().time()
+            timestamp = self._loop.time()
+            # 在发送前清除，避免丢失发送后立即到达的确认
+            self._ack_event.clear()
             await self.websocket.send(MessageFormat.create_heartbeat_message(self.user_id, timestamp))
             self.last_heartbeat_time = timestamp
-            self.heartbeat_received = False
             logger.debug(f"发送心跳消息给用户 {self.user_id}")
         except websockets.exceptions.ConnectionClosed:
+            # 连接已关闭，无法再向对端发送错误消息
             logger.warning(f"发送心跳消息时连接已关闭: {self.user_id}")
-            await self.websocket.send(MessageFormat.create_error_response(
-                "连接已关闭",
-                ErrorCode.SERVER_CONNECTION_ERROR.value
-            ))
             self.is_running = False
         except Exception as e:
             logger.error(f"发送心跳消息失败: {str(e)}", exc_info=True)
-            await self.websocket.send(MessageFormat.create_error_response(
-                "心跳消息发送失败",
-                ErrorCode.SERVER_INTERNAL_ERROR.value
-            ))
+            await self.websocket.send(_ERR_HEARTBEAT_SEND_FAILED)
             self.is_running = False
 
     def handle_message(self, message: str) -> bool:
         """处理接收到的消息"""
+        # 心跳确认消息很短，超长的消息直接交给后续的消息处理
+        if len(message) > MAX_HEARTBEAT_ACK_LENGTH:
+            return False
         if MessageFormat.is_heartbeat_ack_message(message):
-            self.heartbeat_received = True
+            self._ack_event.set()
             self.retry_count = 0
             logger.debug(f"收到用户 {self.user_id} 的心跳响应")
             return True
         return False
 
     async def _wait_for_heartbeat_ack(self) -> None:
-        """等待心跳响应"""
-        start_time = asyncio.get_event_loop().time()
-        while not self.heartbeat_received and self.is_running:
-            if asyncio.get_event_loop().time() - start_time > self.timeout:
-                raise asyncio.TimeoutError()
-            await asyncio.sleep(0.1)
+        """等待心跳响应，超过timeout秒未收到时抛出 asyncio.TimeoutError"""
+        await asyncio.wait_for(self._ack_event.wait(), self.timeout)
 
     async def start(self) -> None:
         """启动心跳检测"""
+        self._loop = asyncio.get_running_loop()
         self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
         return self._heartbeat_task
 
@@ -84,43 +90,36 @@ class HeartbeatManager:
             try:
                 await asyncio.sleep(self.interval)
                 await self.send_heartbeat()
+                # 发送失败时 send_heartbeat 已停止心跳，不再等待确认
+                if not self.is_running:
+                    break
                 await self._wait_for_heartbeat_ack()
             except asyncio.TimeoutError:
                 self.retry_count += 1
                 logger.warning(f"用户 {self.user_id} 心跳超时，第 {self.retry_count} 次")
-                await self.websocket.send(MessageFormat.create_error_response(
-                    "心跳超时",
-                    ErrorCode.HEARTBEAT_TIMEOUT.value
-                ))
+                await self.websocket.send(_ERR_HEARTBEAT_TIMEOUT)
                 if self.retry_count >= self.max_retries:
                     logger.error(f"用户 {self.user_id} 心跳失败，达到最大重试次数")
-                    await self.websocket.send(MessageFormat.create_error_response(
-                        "心跳失败，达到最大重试次数",
-                        ErrorCode.HEARTBEAT_MAX_RETRIES.value
-                    ))
+                    await self.websocket.send(_ERR_HEARTBEAT_MAX_RETRIES)
                     self.is_running = False
                     await self.handle_heartbeat_failure()
                     break
             except websockets.exceptions.ConnectionClosed:
+                # 连接已关闭，无法再向对端发送错误消息
                 logger.warning(f"用户 {self.user_id} 连接已关闭")
-                await self.websocket.send(MessageFormat.create_error_response(
-                    "连接已关闭",
-                    ErrorCode.SERVER_CONNECTION_ERROR.value
-                ))
                 self.is_running = False
                 break
             except Exception as e:
                 logger.error(f"心跳检测发生错误: {str(e)}", exc_info=True)
-                await self.websocket.send(MessageFormat.create_error_response(
-                    "心跳检测发生错误",
-                    ErrorCode.SERVER_INTERNAL_ERROR.value
-                ))
+                await self.websocket.send(_ERR_HEARTBEAT_ERROR)
                 self.is_running = False
                 break
 
     def stop(self) -> None:
         """停止心跳检测"""
         self.is_running = False
+        # 唤醒正在等待心跳确认的协程，使心跳循环立即退出
+        self._ack_event.set()
         if self._heartbeat_task:
             self._heartbeat_task.cancel()
             logger.info(f"停止用户 {self.user_id} 的心跳检测") 
\ No newline at end of file
@@ -1,9 +1,12 @@
+import asyncio
+import shutil
+from functools import lru_cache
 import uuid
 import time
 import logging
 import chromadb
 import os
-from typing import Optional, List, Dict, Any
+from typing import BinaryIO, Optional, List, Dict, Any
 from datetime import datetime
 from src.interface.MessageFormat import MessageFormat
 from src.database.operations import DatabaseOperations
@@ -12,10 +15,21 @@ from src.models.GPTModel import GPTModel
 from src.database.models import UserKnowledgeBase, KnowledgeBaseFile
 from src.interface.ErrorCode import ErrorCode
 from src.interface.GPTServerError import GPTServerError
+from src.config.GPTConfig import get_config
 from fastapi import UploadFile
 
 logger = logging.getLogger(__name__)
 
+# 上传文件写入磁盘时每次复制的字节数
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# 生成向量时每批的文档数，以及同时进行中的批次上限
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CONCURRENCY = 4
+
+# 知识库支持的文件扩展名
+ALLOWED_FILE_EXTENSIONS = frozenset({'.txt', '.md', '.pdf', '.doc', '.docx'})
+
 class KnowledgeBaseManager:
     """知识库管理器"""
     
@@ -45,7 +59,7 @@ class KnowledgeBaseManager:
             GPTServerError: 创建知识库失败时抛出
         """
         try:
-            knowledge_base_id = str(uuid.uuid1())
+            knowledge_base_id = uuid.uuid4().hex
             
             # 如果没有提供标题，使用默认标题
             if not title:
@@ -69,20 +83,20 @@ class KnowledgeBaseManager:
             logger.error(f"创建知识库失败: {str(e)}", exc_info=True)
             raise GPTServerError(f"创建知识库失败: {str(e)}", ErrorCode.SERVER_INTERNAL_ERROR)
 
-    def get_user_knowledge_bases(self, user_id: str) -> List[UserKnowledgeBase]:
+    def get_user_knowledge_bases(self, user_id: str) -> List[Dict[str, Any]]:
         """获取用户的所有知识库
         
         Args:
             user_id (str): 用户ID
             
         Returns:
-            List[UserKnowledgeBase]: 知识库列表
+            List[Dict[str, Any]]: 知识库列表，每行包含 kb_id、title、created_time，可直接序列化返回
             
         Raises:
             GPTServerError: 获取知识库列表失败时抛出
         """
         try:
-            knowledge_bases = self.db_ops.get_user_knowledge_bases(user_id)
+            knowledge_bases = self.db_ops.get_user_knowledge_base_rows(user_id)
             logger.info(f"成功获取用户 {user_id} 的知识库列表")
             return knowledge_bases
         except Exception as e:
@@ -130,33 +144,30 @@ class KnowledgeBaseManager:
         """
         try:
             # 检查知识库是否存在
-            knowledge_base = self.db_ops.get_knowledge_base(knowledge_base_id)
+            knowledge_base = await asyncio.to_thread(self.db_ops.get_knowledge_base, knowledge_base_id)
             if not knowledge_base:
                 raise GPTServerError("知识库不存在", ErrorCode.SERVER_INTERNAL_ERROR)
             
             # 检查文件类型
-            allowed_types = ['.txt', '.md', '.pdf', '.doc', '.docx']
             file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in allowed_types:
+            if file_ext not in ALLOWED_FILE_EXTENSIONS:
                 raise GPTServerError(f"不支持的文件类型: {file_ext}", ErrorCode.INVALID_PARAMETER)
             
             # 生成文件ID
-            file_id = str(uuid.uuid1())
+            file_id = uuid.uuid4().hex
             
             # 创建文件保存路径
             save_dir = os.path.join("uploads", knowledge_base_id)
             os.makedirs(save_dir, exist_ok=True)
             file_path = os.path.join(save_dir, f"{file_id}{file_ext}")
             
-            # 保存文件
-            file_content = await file.read()
-            with open(file_path, "wb") as f:
-                f.write(file_content)
+            # 保存文件：在线程中分块复制到磁盘，不把整个上传文件读入内存
+            await asyncio.to_thread(self.save_upload_file, file.file, file_path, get_config().upload_max_bytes)
+            # 摘要和向量化都需要文本内容，只解码一次
+            file_content = await asyncio.to_thread(self.read_text_file, file_path)
             
-            # 生成文件摘要
-            summary = self.model.generate_summary(
-                file_content.decode('utf-8', errors='ignore')
-            )
+            # 生成文件摘要、向量化和写入数据库都是同步调用，放到线程中执行，避免阻塞事件循环
+            summary = await asyncio.to_thread(self.model.generate_summary, file_content)
             
             # 创建文件记录
             file_message = KnowledgeBaseFile(
@@ -169,26 +180,19 @@ class KnowledgeBaseManager:
             )
             
             # 保存文件记录
-            success = self.db_ops.create_knowledge_base_file(file_message)
+            success = await asyncio.to_thread(self.db_ops.create_knowledge_base_file, file_message)
             if not success:
                 # 如果保存记录失败，删除已上传的文件
                 os.remove(file_path)
                 raise GPTServerError("保存文件记录失败", ErrorCode.SERVER_INTERNAL_ERROR)
             
             # 处理文件内容
-            docs = self.split_content(file_content.decode('utf-8', errors='ignore'))
+            docs = self.split_content(file_content)
             ids = self.docs_ids(docs)
-            embeds = self.model.embed_texts(docs)
+            embeds = await self.embed_documents(docs)
             
             # 添加到向量数据库
-            knowledge_base_collection = self.knowledge_base.get_or_create_collection(
-                name=knowledge_base_id
-            )
-            knowledge_base_collection.add(
-                ids=ids,
-                documents=docs,
-                embeddings=embeds,
-            )
+            await asyncio.to_thread(self._add_to_collection, knowledge_base_id, ids, docs, embeds)
             
             logger.info(f"成功将文件 {file.filename} 添加到知识库 {knowledge_base_id}")
             
@@ -207,14 +211,15 @@ class KnowledgeBaseManager:
             # 确保文件被关闭
             await file.close()
 
-    def get_knowledge_base_files(self, knowledge_base_id: str) -> List[KnowledgeBaseFile]:
+    def get_knowledge_base_files(self, knowledge_base_id: str) -> Optional[List[Dict[str, Any]]]:
         """获取知识库的所有文件
         
         Args:
             knowledge_base_id (str): 知识库ID
             
         Returns:
-            List[KnowledgeBaseFile]: 文件列表
+            Optional[List[Dict[str, Any]]]: 文件列表，每行包含 file_id、file_name、file_path、summary、created_time，
+                可直接序列化返回；知识库不存在时返回None
             
         Raises:
             GPTServerError: 获取文件列表失败时抛出
@@ -223,9 +228,9 @@ class KnowledgeBaseManager:
             # 检查知识库是否存在
             knowledge_base = self.db_ops.get_knowledge_base(knowledge_base_id)
             if not knowledge_base:
-                raise GPTServerError("知识库不存在", ErrorCode.SERVER_INTERNAL_ERROR)
+                return None
             
-            files = self.db_ops.get_knowledge_base_files(knowledge_base_id)
+            files = self.db_ops.get_knowledge_base_file_rows(knowledge_base_id)
             logger.info(f"成功获取知识库 {knowledge_base_id} 的文件列表")
             return files
         except Exception as e:
@@ -376,6 +381,76 @@ class KnowledgeBaseManager:
             logger.error(f"删除知识库文件失败: {str(e)}", exc_info=True)
             raise GPTServerError(f"删除知识库文件失败: {str(e)}", ErrorCode.SERVER_INTERNAL_ERROR)
 
+    async def embed_documents(self, docs: List[str]) -> List[List[float]]:
+        """分批并发生成文档向量，返回顺序与docs一致
+
+        Args:
+            docs (List[str]): 文档列表
+
+        Returns:
+            List[List[float]]: 向量列表
+        """
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await asyncio.to_thread(self.model.embed_texts, batch)
+
+        batches = [docs[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(docs), EMBEDDING_BATCH_SIZE)]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [embed for batch_embeds in results for embed in batch_embeds]
+
+    def _add_to_collection(
+        self,
+        knowledge_base_id: str,
+        ids: List[str],
+        docs: List[str],
+        embeds: List[List[float]]
+    ) -> None:
+        """将文档及其向量写入知识库对应的chromadb集合"""
+        knowledge_base_collection = self.knowledge_base.get_or_create_collection(
+            name=knowledge_base_id
+        )
+        knowledge_base_collection.add(
+            ids=ids,
+            documents=docs,
+            embeddings=embeds,
+        )
+
+    @staticmethod
+    def save_upload_file(
+        source: BinaryIO,
+        file_path: str,
+        max_bytes: Optional[int] = None,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> None:
+        """将上传文件按块复制到磁盘
+
+        Raises:
+            GPTServerError: 文件超过 max_bytes 时删除已写入的部分并抛出
+        """
+        if max_bytes is None:
+            with open(file_path, "wb") as f:
+                shutil.copyfileobj(source, f, chunk_size)
+            return
+
+        written = 0
+        with open(file_path, "wb") as f:
+            while chunk := source.read(chunk_size):
+                written += len(chunk)
+                if written > max_bytes:
+                    break
+                f.write(chunk)
+        if written > max_bytes:
+            os.remove(file_path)
+            raise GPTServerError(f"文件大小超过上限 {max_bytes} 字节", ErrorCode.INVALID_PARAMETER)
+
+    @staticmethod
+    def read_text_file(file_path: str) -> str:
+        """按UTF-8读取文本内容，忽略无法解码的字节"""
+        with open(file_path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+            return f.read()
+
     @staticmethod
     def safe_delete_file(target_dir, filename):
         for entry in os.listdir(target_dir):
@@ -396,7 +471,9 @@ class KnowledgeBaseManager:
         Returns:
             List[str]: 文档ID列表
         """
-        return [str(uuid.uuid1()) for _ in texts]
+        # 一次读取全部随机字节，每16字节对应一个32位十六进制ID
+        random_hex = os.urandom(16 * len(texts)).hex()
+        return [random_hex[i:i + 32] for i in range(0, len(random_hex), 32)]
 
     @staticmethod
     def split_content(content: str, max_length: int = 256) -> List[str]:
@@ -409,7 +486,10 @@ class KnowledgeBaseManager:
         Returns:
             List[str]: 分割后的内容列表
         """
-        chunks = []
-        for i in range(0, len(content), max_length):
-            chunks.append(content[i:i + max_length])
-        return chunks 
\ No newline at end of file
+        return [content[i:i + max_length] for i in range(0, len(content), max_length)]
+
+
+@lru_cache(maxsize=None)
+def get_knowledge_base_manager(db_ops: DatabaseOperations, model: GPTModel) -> KnowledgeBaseManager:
+    """获取知识库管理器，相同的数据库操作和模型实例共用一个管理器，避免重复打开chromadb客户端"""
+    return KnowledgeBaseManager(db_ops, model)
@@ -1,4 +1,4 @@
-import json
+import asyncio
 import logging
 from typing import Dict, Optional
 from datetime import datetime
@@ -7,11 +7,12 @@ import uuid
 from websockets import ServerConnection
 
 from src.GPTServer.AuthenticationHandler import AuthenticationHandler
-from src.interface import Messages
+from src.interface import Messages, serialization
 from src.interface.EnumModel import EnumModel
 from src.interface.MCPServers import MCPServers
 from src.interface.WebsocketMessage import WebsocketMessage
 from src.GPTServer.HeartbeatManager import HeartbeatManager
+from src.GPTServer.KnowledgeBaseManager import get_knowledge_base_manager
 from src.interface.MessageFormat import MessageFormat
 from src.interface.ErrorCode import ErrorCode
 from src.interface.GPTServerError import MessageProcessingError, ToolExecutionError
@@ -19,6 +20,44 @@ from src.database.models import Message
 
 logger = logging.getLogger(__name__)
 
+# 请求类型常量，避免每条消息都访问枚举属性
+SETTINGS_ADD_SERVER = MessageFormat.RequestType.SETTINGS_ADD_SERVER.value
+CONVERSATION_QUESTION = MessageFormat.RequestType.CONVERSATION_QUESTION.value
+CONVERSATION_MESSAGE = MessageFormat.RequestType.CONVERSATION_MESSAGE.value
+QUESTION = MessageFormat.RequestType.QUESTION.value
+EXECUTE_TOOLS = MessageFormat.RequestType.EXECUTE_TOOLS.value
+DELETE_CONVERSATION = MessageFormat.RequestType.DELETE_CONVERSATION.value
+GET_CONVERSATION_LIST = MessageFormat.RequestType.GET_CONVERSATION_LIST.value
+
+# 固定内容的响应，导入时序列化一次
+LOGOUT_SUCCESS_RESPONSE = MessageFormat.create_logout_success_response()
+
+# 默认系统提示词
+DEFAULT_SYSTEM_PROMPT = """# 角色定义
+你叫"智链",是一个专业的AI助手,你的回答必须严格遵守以下规则:
+
+# 回答规则
+1.用户的问题必须使用中文回答
+2.精通各种工具函数的调用,具备跨平台数据接口调用权限,能够精准解析用户需求并调用最佳工具函数获取结构化数据
+3.精通多种编程语言、框架、设计模式和最佳实践,通晓17种编程范式,擅长模块化设计(含DDD/微服务架构),代码生成通过ISO/IEC 5055认证
+"""
+
+# 知识库问答系统提示词，{context} 由 str.format 替换为检索到的知识库内容
+KNOWLEDGE_BASE_SYSTEM_PROMPT = """# 角色定义
+你叫"智链",是一个专业的AI助手,你的回答必须严格遵守以下规则:
+
+# 回答规则
+1.用户的问题必须使用中文回答
+2.精通各种工具函数的调用,具备跨平台数据接口调用权限,能够精准解析用户需求并调用最佳工具函数获取结构化数据
+3.精通多种编程语言、框架、设计模式和最佳实践,通晓17种编程范式,擅长模块化设计(含DDD/微服务架构),代码生成通过ISO/IEC 5055认证
+4.用户的问题必须严格基于以下上下文内容回答：
+4-1.当上下文内容无法回答问题, 并且此时调用工具函数如果有可能解决问题, 那么你会去调用工具函数
+4-2.当上下文内容无法回答问题，并且调用的工具函数返回的信息也无法解决问题，那么你会回答"对不起，这个问题我无法回答，因为我目前没有掌握足够的信息。请您按照以下操作来增加解决的可能性:\n1.提供更详细的问题\n2.向知识库添加更多的相关文件\n3.添加更多有助于我解决问题的工具函数"
+
+# 上下文
+{context}
+"""
+
 class MessageHandler:
     """WebSocket消息处理器"""
     
@@ -31,6 +70,7 @@ class MessageHandler:
         self.conversation_manager = gpt_server.conversation_manager
         self.db_ops = gpt_server.db_ops
         self.gpt_server = gpt_server
+        self.auth_handler = AuthenticationHandler(self.db_ops)
         
     async def handle_message(
         self,
@@ -54,6 +94,16 @@ class MessageHandler:
         message_type = websocket_message.get_type()
         logger.info('message_type: %s', message_type)
 
+        handler = self._message_handlers.get(message_type)
+        if handler is None:
+            error_msg = f"未知消息类型: {message_type}"
+            logger.warning(error_msg)
+            await websocket.send(MessageFormat.create_error_response(
+                error_msg,
+                ErrorCode.MSG_INVALID_TYPE.value
+            ))
+            return
+
         try:
             question = websocket_message.get_question()
             knowledge_base_id = websocket_message.get_knowledge_base_id()
@@ -62,6 +112,9 @@ class MessageHandler:
             return
 
 
+        # 默认使用通用系统提示词，检索到知识库内容时再替换；提示词只属于本次请求，不能存放在共享对象上
+        system_prompt = DEFAULT_SYSTEM_PROMPT
+
         if question and knowledge_base_id:
             # 如果存在知识库ID，搜索相关知识
             knowledge_base_id = websocket_message.get_knowledge_base_id()
@@ -72,98 +125,28 @@ class MessageHandler:
                     
                     if last_user_message:
                         # 搜索知识库
-                        from src.GPTServer.KnowledgeBaseManager import KnowledgeBaseManager
-                        kb_manager = KnowledgeBaseManager(self.db_ops, self.gpt_server.conversation_manager.model)
-                        search_results = kb_manager.search_texts_in_knowledge_base(
-                            knowledge_base_id, 
+                        kb_manager = get_knowledge_base_manager(self.db_ops, self.gpt_server.model)
+                        # 向量检索包含同步的embedding请求，放到线程中执行避免阻塞事件循环
+                        search_results = await asyncio.to_thread(
+                            kb_manager.search_texts_in_knowledge_base,
+                            knowledge_base_id,
                             last_user_message
                         )
                         
                         # 构建知识库提示词
                         if search_results:
-                            knowledge_prompt = ""
-                            for index, doc in enumerate(search_results):
-                                knowledge_prompt += f"{index+1}. {doc}\n\n"
+                            knowledge_prompt = "".join(
+                                f"{index}. {doc}\n\n" for index, doc in enumerate(search_results, 1)
+                            )
                             
-                            self.gpt_server.system_prompts = """# 角色定义
-你叫"智链",是一个专业的AI助手,你的回答必须严格遵守以下规则:
-
-# 回答规则
-1.用户的问题必须使用中文回答
-2.精通各种工具函数的调用,具备跨平台数据接口调用权限,能够精准解析用户需求并调用最佳工具函数获取结构化数据
-3.精通多种编程语言、框架、设计模式和最佳实践,通晓17种编程范式,擅长模块化设计(含DDD/微服务架构),代码生成通过ISO/IEC 5055认证
-4.用户的问题必须严格基于以下上下文内容回答：
-4-1.当上下文内容无法回答问题, 并且此时调用工具函数如果有可能解决问题, 那么你会去调用工具函数
-4-2.当上下文内容无法回答问题，并且调用的工具函数返回的信息也无法解决问题，那么你会回答"对不起，这个问题我无法回答，因为我目前没有掌握足够的信息。请您按照以下操作来增加解决的可能性:\n1.提供更详细的问题\n2.向知识库添加更多的相关文件\n3.添加更多有助于我解决问题的工具函数"
-
-# 上下文
-{{context}}
-"""
-
                             # 将知识库内容添加到system message
-                            self.gpt_server.system_prompts = self.gpt_server.system_prompts.replace("{{context}}", knowledge_prompt)
+                            system_prompt = KNOWLEDGE_BASE_SYSTEM_PROMPT.format(context=knowledge_prompt)
                 except Exception as e:
                     logger.error(f"搜索知识库失败: {str(e)}", exc_info=True)
                     # 如果搜索失败，继续使用原有方式回答
-        else:
-            self.gpt_server.system_prompts = """# 角色定义
-你叫"智链",是一个专业的AI助手,你的回答必须严格遵守以下规则:
 
-# 回答规则
-1.用户的问题必须使用中文回答
-2.精通各种工具函数的调用,具备跨平台数据接口调用权限,能够精准解析用户需求并调用最佳工具函数获取结构化数据
-3.精通多种编程语言、框架、设计模式和最佳实践,通晓17种编程范式,擅长模块化设计(含DDD/微服务架构),代码生成通过ISO/IEC 5055认证
-"""
-
-        
-        message_handlers = {
-            "logout": lambda: websocket.send(MessageFormat.create_logout_success_response()),
-            MessageFormat.RequestType.SETTINGS_ADD_SERVER.value: lambda: AuthenticationHandler(self.db_ops).settings_user_server(
-                websocket_message.get_server(),
-                user_id,
-                websocket_manager=self.gpt_server.websocket_manager,
-            ),
-            MessageFormat.RequestType.CONVERSATION_QUESTION.value: lambda: self.conversation_manager.answer_conversation_question(
-                websocket_message.get_question(),
-                user_id,
-                websocket_message.get_mcp_servers()
-            ),
-            MessageFormat.RequestType.CONVERSATION_MESSAGE.value: lambda: self.conversation_manager.answer_conversation_message(
-                websocket_message.get_conversation_id(),
-                user_id
-            ),
-            MessageFormat.RequestType.QUESTION.value: lambda: self.conversation_manager.answer_question(
-                websocket_message.get_question(),
-                user_id,
-                websocket_message.get_conversation_id(),
-                websocket_message.get_mcp_servers(),
-            ),
-            MessageFormat.RequestType.EXECUTE_TOOLS.value: lambda: self.conversation_manager.answer_question_with_tools(
-                websocket_message.get_question(),
-                user_id,
-                websocket_message.get_conversation_id(),
-                websocket_message.get_select_functions(),
-                websocket_message.get_mcp_servers()
-            ),
-            MessageFormat.RequestType.DELETE_CONVERSATION.value: lambda: self.conversation_manager.delete_conversation(
-                websocket_message.get_conversation_id(),
-                user_id
-            ),
-            MessageFormat.RequestType.GET_CONVERSATION_LIST.value: lambda: self.conversation_manager.get_conversation_list(
-                user_id
-            )
-        }
         
-        handler = message_handlers.get(message_type)
-        if handler:
-            await handler()
-        else:
-            error_msg = f"未知消息类型: {message_type}"
-            logger.warning(error_msg)
-            await websocket.send(MessageFormat.create_error_response(
-                error_msg,
-                ErrorCode.MSG_INVALID_TYPE.value
-            ))
+        await handler(self, websocket, websocket_message, user_id, system_prompt)
 
     async def handle_message_error(self, websocket: ServerConnection, error: Exception) -> None:
         """处理消息处理过程中的错误
@@ -172,7 +155,7 @@ class MessageHandler:
             websocket (ServerConnection): WebSocket连接
             error (Exception): 错误对象
         """
-        if isinstance(error, json.JSONDecodeError):
+        if isinstance(error, serialization.JSONDecodeError):
             error_msg = f"JSON解析错误: {str(error)}"
             error_code = ErrorCode.MSG_JSON_PARSE_ERROR.value
         elif isinstance(error, MessageProcessingError):
@@ -198,8 +181,13 @@ class MessageHandler:
             websocket (ServerConnection): WebSocket连接
             user_id (str): 用户ID
         """
-        # 获取并发送对话记录
-        conversations = self.db_ops.get_user_conversations(user_id)
+        # 对话记录和用户设置互不依赖，两个查询并发执行
+        conversations, user_settings = await asyncio.gather(
+            asyncio.to_thread(self.db_ops.get_user_conversations, user_id),
+            asyncio.to_thread(self.db_ops.get_user_settings, user_id)
+        )
+
+        # 发送对话记录
         logger.info(f"获取到用户 {user_id} 的对话记录: {conversations}")
         if conversations:
             await websocket.send(
@@ -208,12 +196,79 @@ class MessageHandler:
                 )
             )
             
-        # 获取并发送用户设置
-        user_settings = self.db_ops.get_user_settings(user_id)
+        # 发送用户设置
         logger.info(f"获取到用户 {user_id} 的服务器设置: {user_settings}")
         if user_settings:
             await websocket.send(
                 MessageFormat.create_user_settings_response(
                     user_settings
                 )
-            ) 
\ No newline at end of file
+            ) 
+
+    # 各消息类型的处理方法，参数统一为 (websocket, websocket_message, user_id, system_prompt)
+
+    async def _handle_logout(self, websocket, websocket_message, user_id, system_prompt):
+        self.conversation_manager.invalidate_user_messages(user_id)
+        await websocket.send(LOGOUT_SUCCESS_RESPONSE)
+
+    async def _handle_settings_add_server(self, websocket, websocket_message, user_id, system_prompt):
+        await self.auth_handler.settings_user_server(
+            websocket_message.get_server(),
+            user_id,
+            websocket_manager=self.gpt_server.websocket_manager,
+        )
+
+    async def _handle_conversation_question(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.answer_conversation_question(
+            websocket_message.get_question(),
+            user_id,
+            websocket_message.get_mcp_servers(),
+            system_prompt
+        )
+
+    async def _handle_conversation_message(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.answer_conversation_message(
+            websocket_message.get_conversation_id(),
+            user_id,
+            websocket_message.get_since_message_id()
+        )
+
+    async def _handle_question(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.answer_question(
+            websocket_message.get_question(),
+            user_id,
+            websocket_message.get_conversation_id(),
+            websocket_message.get_mcp_servers(),
+            system_prompt
+        )
+
+    async def _handle_execute_tools(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.answer_question_with_tools(
+            websocket_message.get_question(),
+            user_id,
+            websocket_message.get_conversation_id(),
+            websocket_message.get_select_functions(),
+            websocket_message.get_mcp_servers(),
+            system_prompt
+        )
+
+    async def _handle_delete_conversation(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.delete_conversation(
+            websocket_message.get_conversation_id(),
+            user_id
+        )
+
+    async def _handle_get_conversation_list(self, websocket, websocket_message, user_id, system_prompt):
+        await self.conversation_manager.get_conversation_list(user_id)
+
+    # 消息类型 -> 处理方法，类定义时构建一次
+    _message_handlers = {
+        "logout": _handle_logout,
+        SETTINGS_ADD_SERVER: _handle_settings_add_server,
+        CONVERSATION_QUESTION: _handle_conversation_question,
+        CONVERSATION_MESSAGE: _handle_conversation_message,
+        QUESTION: _handle_question,
+        EXECUTE_TOOLS: _handle_execute_tools,
+        DELETE_CONVERSATION: _handle_delete_conversation,
+        GET_CONVERSATION_LIST: _handle_get_conversation_list,
+    }
@@ -0,0 +1,79 @@
+import asyncio
+import hmac
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# argon2哈希的统一前缀，用于区分旧的明文密码
+_ARGON2_PREFIX = "$argon2"
+
+# 密码格式：至少8位，同时包含字母和数字，一次正则扫描完成全部检查
+_PASSWORD_PATTERN = re.compile(r"(?=.*[^\W\d_])(?=.*\d).{8,}", re.DOTALL)
+
+# argon2id参数：迭代2次、19 MiB内存、单线程，单次哈希约数十毫秒
+_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# 密码哈希计算量较大，放到共享线程池中执行，避免阻塞事件循环
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="password-hasher")
+
+
+def is_valid_password(password: str) -> bool:
+    """检查密码格式是否合法（至少8位，包含字母和数字）"""
+    return _PASSWORD_PATTERN.fullmatch(password) is not None
+
+
+def hash_password(password: str) -> str:
+    """计算密码哈希
+
+    Args:
+        password (str): 明文密码
+
+    Returns:
+        str: argon2哈希字符串
+    """
+    return _hasher.hash(password)
+
+
+def verify_password(stored_password: str, password: str) -> bool:
+    """校验密码是否与存储的密码匹配
+
+    存储值不是argon2哈希时按旧的明文密码处理，使用常量时间比较。
+
+    Args:
+        stored_password (str): 数据库中存储的密码
+        password (str): 用户提交的明文密码
+
+    Returns:
+        bool: 密码是否匹配
+    """
+    if not stored_password.startswith(_ARGON2_PREFIX):
+        return hmac.compare_digest(stored_password.encode(), password.encode())
+    try:
+        return _hasher.verify(stored_password, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """存储的密码是否需要重新计算哈希（旧的明文密码，或哈希参数已过时）"""
+    if not stored_password.startswith(_ARGON2_PREFIX):
+        return True
+    try:
+        return _hasher.check_needs_rehash(stored_password)
+    except InvalidHashError:
+        return True
+
+
+async def hash_password_async(password: str) -> str:
+    """在共享线程池中计算密码哈希"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
+
+
+async def verify_password_async(stored_password: str, password: str) -> bool:
+    """在共享线程池中校验密码"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, verify_password, stored_password, password)
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+
+class StreamBuffer:
+    """流式输出缓冲器，将多个小的增量片段合并为一帧发送
+
+    缓冲区非空时会启动定时器，即使上游暂停输出，缓冲内容也会在 max_delay 内发出。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        max_chars: int = 256,
+        max_delay: float = 0.02
+    ):
+        """初始化缓冲器
+
+        Args:
+            send: 发送合并后文本的协程函数
+            max_chars (int): 缓冲区达到该字符数时立即发送
+            max_delay (float): 距上次发送超过该时间（秒）时立即发送
+        """
+        self._send = send
+        self._max_chars = max_chars
+        self._max_delay = max_delay
+        self._buffer: List[str] = []
+        self._size = 0
+        self._loop = asyncio.get_running_loop()
+        self._last_flush = self._loop.time()
+        # 保证各次发送按顺序进行，不会与定时发送交错
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+    async def append(self, text: str) -> None:
+        """追加一个增量片段，满足阈值时发送缓冲内容"""
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self._max_chars or self._loop.time() - self._last_flush >= self._max_delay:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self._max_delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        """定时器到期，在后台发送缓冲内容"""
+        self._timer = None
+        self._timer_task = self._loop.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """发送缓冲区中的全部内容，并等待尚未完成的定时发送结束"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        timer_task = self._timer_task
+        if timer_task is not None and timer_task is not asyncio.current_task():
+            self._timer_task = None
+            await timer_task
+        async with self._lock:
+            self._last_flush = self._loop.time()
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            await self._send(text)
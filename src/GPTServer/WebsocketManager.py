@@ -1,49 +1,66 @@
 import logging
 import asyncio
-from typing import Dict, Optional, Set
-from asyncio import Lock, Queue
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from asyncio import Queue, QueueFull
 from websockets import ServerConnection
+from websockets.exceptions import ConnectionClosed
 
 logger = logging.getLogger(__name__)
 
 class WebsocketManager:
-    """WebSocket连接管理器"""
+    """WebSocket连接管理器
+
+    每个连接有一个发送队列和一个写任务，send_to_user 只把消息放入队列，
+    写任务按顺序逐条发送，发送过程不阻塞调用方，也不需要全局加锁。
+    """
     
-    def __init__(self):
-        """初始化WebSocket管理器"""
-        self._active_connections: Dict[str, ServerConnection] = {}  # 连接池：{user_id: websocket}
-        self._connection_lock: Lock = Lock()  # 连接池锁
-        self._active_workers: Set[str] = set()  # 活跃的工作任务
-        self._worker_lock: Lock = Lock()  # 工作任务锁
-        # 线程池配置
-        self._thread_pool = ThreadPoolExecutor(max_workers=10)  # 最多10个线程
-        # 流控制参数
-        self._send_interval = 0.05  # 消息之间的发送间隔(秒)，20条/秒
+    def __init__(self, send_queue_size: int = 1024, send_timeout: float = 5.0):
+        """初始化WebSocket管理器
+
+        Args:
+            send_queue_size (int): 每个连接发送队列的最大长度，队列满时 send_to_user 等待写任务发送
+            send_timeout (float): 队列满时 send_to_user 最多等待的秒数，超时后丢弃该消息
+        """
+        # 连接池：{user_id: websocket}，单键的读写删除在事件循环中是原子的，无需加锁
+        self._active_connections: Dict[str, ServerConnection] = {}
+        # 每个连接的发送队列与写任务：{user_id: queue} / {user_id: task}
+        self._send_queues: Dict[str, Queue] = {}
+        self._writer_tasks: Dict[str, asyncio.Task] = {}
+        self._send_queue_size = send_queue_size
+        self._send_timeout = send_timeout
     
-    async def add_connection(self, user_id: str, websocket: ServerConnection) -> None:
-        """添加连接
+    def add_connection(self, user_id: str, websocket: ServerConnection) -> None:
+        """添加连接，并启动该连接的写任务
         
         Args:
             user_id (str): 用户ID
             websocket (ServerConnection): WebSocket连接
         """
-        async with self._connection_lock:
-            self._active_connections[user_id] = websocket
-            logger.info(f"用户 {user_id} 已连接，当前在线用户数：{len(self._active_connections)}")
+        # 同一用户重连时，旧连接的写任务不再需要
+        self._stop_writer(user_id)
+        queue = Queue(maxsize=self._send_queue_size)
+        self._active_connections[user_id] = websocket
+        self._send_queues[user_id] = queue
+        self._writer_tasks[user_id] = asyncio.create_task(self._writer_loop(user_id, websocket, queue))
+        logger.info(f"用户 {user_id} 已连接，当前在线用户数：{len(self._active_connections)}")
     
-    async def remove_connection(self, user_id: str) -> None:
-        """移除连接
+    def remove_connection(self, user_id: str, websocket: Optional[ServerConnection] = None) -> None:
+        """移除连接，并停止该连接的写任务
+        
+        检查与删除之间没有await，整个过程不会被其他协程打断，因此无需加锁。
         
         Args:
             user_id (str): 用户ID
+            websocket (Optional[ServerConnection]): 要移除的连接；指定时只有当前登记的正是该连接才移除，
+                避免旧连接关闭时把同一用户重连后的新连接移除
         """
-        async with self._connection_lock:
-            if user_id in self._active_connections:
-                del self._active_connections[user_id]
-                logger.info(f"用户 {user_id} 已断开连接，当前在线用户数：{len(self._active_connections)}")
+        if websocket is not None and self._active_connections.get(user_id) is not websocket:
+            return
+        self._stop_writer(user_id)
+        if self._active_connections.pop(user_id, None) is not None:
+            logger.info(f"用户 {user_id} 已断开连接，当前在线用户数：{len(self._active_connections)}")
     
-    async def get_connection(self, user_id: str) -> Optional[ServerConnection]:
+    def get_connection(self, user_id: str) -> Optional[ServerConnection]:
         """获取连接
         
         Args:
@@ -52,65 +69,98 @@ class WebsocketManager:
         Returns:
             Optional[ServerConnection]: WebSocket连接，如果不存在则返回None
         """
-        async with self._connection_lock:
-            return self._active_connections.get(user_id)
+        return self._active_connections.get(user_id)
+
+    def _stop_writer(self, user_id: str) -> None:
+        """停止用户的写任务，丢弃尚未发送的消息"""
+        self._send_queues.pop(user_id, None)
+        writer_task = self._writer_tasks.pop(user_id, None)
+        if writer_task is not None:
+            writer_task.cancel()
     
-    async def _send_message(self, websocket: ServerConnection, message: str) -> None:
-        """发送单条消息的异步方法
+    async def _writer_loop(self, user_id: str, websocket: ServerConnection, queue: Queue) -> None:
+        """按顺序发送队列中的消息，连接关闭后结束
         
         Args:
+            user_id (str): 用户ID
             websocket (ServerConnection): WebSocket连接
-            message (str): 消息内容
+            queue (Queue): 该连接的发送队列
         """
         try:
-            await websocket.send(message)
-            await asyncio.sleep(self._send_interval)  # 控制发送速率
-        except Exception as e:
-            logger.error(f"发送消息失败: {str(e)}")
-            raise
+            while True:
+                message = await queue.get()
+                try:
+                    await websocket.send(message)
+                except ConnectionClosed:
+                    logger.warning(f"用户 {user_id} 的连接已关闭，停止发送消息")
+                    return
+                except Exception as e:
+                    logger.error(f"向用户 {user_id} 发送消息失败: {str(e)}")
+        finally:
+            # 写任务结束后注销自己的队列，之后的消息直接丢弃，不会堆积在无人消费的队列里；
+            # 同一用户已重连时登记的是新连接的队列，不能注销
+            if self._send_queues.get(user_id) is queue:
+                del self._send_queues[user_id]
+                self._writer_tasks.pop(user_id, None)
     
     async def send_to_user(self, target_user_id: str, message: str, priority: bool = False) -> None:
-        """向指定用户发送消息（使用线程池并发发送）
+        """向指定用户发送消息
+        
+        消息放入该连接的发送队列后立即返回，由写任务按顺序发送；
+        队列已满时最多等待 send_timeout 秒，对过快的生产者形成背压，超时后丢弃该消息。
+        连接已关闭（写任务已结束）时直接丢弃消息。
         
         Args:
             target_user_id (str): 目标用户ID
             message (str): 消息内容
-            priority (bool): 是否为优先消息（在线程池实现中暂不支持）
+            priority (bool): 是否为优先消息（发送队列按顺序发送，暂不支持）
         """
-        # 检查用户是否在线
-        websocket = await self.get_connection(target_user_id)
-        if not websocket:
+        queue = self._send_queues.get(target_user_id)
+        writer_task = self._writer_tasks.get(target_user_id)
+        if queue is None or writer_task is None or writer_task.done():
             logger.warning(f"用户 {target_user_id} 不在线，无法发送消息")
             return
-        
         try:
-            # 使用线程池提交发送任务
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                self._thread_pool,
-                lambda: asyncio.run_coroutine_threadsafe(
-                    self._send_message(websocket, message),
-                    loop
-                )
-            )
-            logger.debug(f"消息已提交到线程池发送给用户 {target_user_id}")
-        except Exception as e:
-            logger.error(f"向用户 {target_user_id} 发送消息失败: {str(e)}")
+            queue.put_nowait(message)
+            return
+        except QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(queue.put(message), self._send_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"用户 {target_user_id} 的发送队列持续已满，丢弃消息")
     
-    def set_send_rate(self, messages_per_second: int) -> None:
-        """设置每秒发送消息的数量限制
-        
+    async def broadcast(self, user_ids: Iterable[str], message: str, batch_size: int = 50) -> None:
+        """向多个用户发送同一条消息
+
+        消息放入各连接的发送队列，与 send_to_user 的消息保持顺序；每处理 batch_size 个用户
+        让出一次事件循环，避免大批量推送长时间占用事件循环。发送队列已满的连接会跳过本条消息，
+        不在线的用户会被忽略。
+
         Args:
-            messages_per_second (int): 每秒消息数量
+            user_ids (Iterable[str]): 目标用户ID列表
+            message (str): 消息内容
+            batch_size (int): 每批处理的用户数
         """
-        if messages_per_second <= 0:
-            messages_per_second = 20  # 默认值
-        self._send_interval = 1.0 / messages_per_second
+        # 先复制目标列表，让出事件循环期间连接池可能发生变化
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), batch_size):
+            if start:
+                await asyncio.sleep(0)
+            for user_id in user_ids[start:start + batch_size]:
+                queue = self._send_queues.get(user_id)
+                if queue is None:
+                    continue
+                try:
+                    queue.put_nowait(message)
+                except QueueFull:
+                    logger.warning(f"用户 {user_id} 的发送队列已满，跳过广播消息")
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """异步上下文管理器出口，确保资源正确释放"""
-        self._thread_pool.shutdown(wait=True) 
\ No newline at end of file
+        """异步上下文管理器出口，停止所有写任务"""
+        for user_id in list(self._writer_tasks):
+            self._stop_writer(user_id)
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from src.interface.EnumModel import EnumModel
 
 class GPTConfig:
@@ -11,11 +12,33 @@ class GPTConfig:
         self.heartbeat_interval = int(os.getenv("HEARTBEAT_INTERVAL", 5))
         self.server_host = os.getenv("SERVER_HOST", "localhost")
         self.server_port = int(os.getenv("SERVER_PORT", 8765))
+        # 客户端单条WebSocket消息的最大字节数，超过时服务器关闭连接
+        self.ws_max_message_size = int(os.getenv("WS_MAX_MESSAGE_SIZE", 2 ** 20))
+        # 流式回答合并发送的阈值：缓冲字符数、距上次发送的最长间隔（秒）
+        self.stream_flush_chars = int(os.getenv("STREAM_FLUSH_CHARS", 256))
+        self.stream_flush_interval = float(os.getenv("STREAM_FLUSH_INTERVAL", 0.02))
+        # 同时进行中的工具调用HTTP请求上限
+        self.tool_concurrency = int(os.getenv("TOOL_CONCURRENCY", 64))
         self.http_host = os.getenv("HTTP_HOST", "localhost")
         self.http_port = int(os.getenv("HTTP_PORT", 8080))
+        # 单独启动HTTP服务器时的工作进程数，0表示与CPU核数相同
+        self.http_workers = int(os.getenv("HTTP_WORKERS", 1)) or os.cpu_count()
+        # 知识库上传文件的最大字节数
+        self.upload_max_bytes = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+        # 允许跨域访问HTTP接口的来源，多个来源用逗号分隔，"*"表示允许所有来源
+        self.cors_origins = [
+            origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()
+        ]
         self.db_host = os.getenv("DB_HOST", "127.0.0.1")
         self.db_port = int(os.getenv("DB_PORT", 3306))
         self.db_user = os.getenv("DB_USER", "root")
         self.db_password = os.getenv("DB_PASSWORD", "123456")
         self.db_name = os.getenv("DB_NAME", "test")
-        
\ No newline at end of file
+        # 数据库连接池保留的空闲连接数
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 10))
+
+
+@lru_cache(maxsize=1)
+def get_config() -> GPTConfig:
+    """返回进程内共享的配置实例，环境变量只在首次调用时读取"""
+    return GPTConfig()
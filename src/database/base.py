@@ -1,84 +1,184 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import pymysql
 from pymysql.cursors import DictCursor
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 
 class Database:
-    def __init__(self, host: str, port: int, user: str, password: str, database: str):
+    """PyMySQL数据库访问，线程安全
+
+    连接保存在连接池中复用，每条语句从池中借出一个连接，执行完毕后归还，
+    因此可以在多个线程（例如 asyncio.to_thread）中并发调用。
+    begin_transaction 会把一个连接绑定到当前线程，直到提交或回滚。
+    """
+    def __init__(self, host: str, port: int, user: str, password: str, database: str,
+                 pool_size: int = 10, ping_interval: float = 60):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
-        self.connection = None
+        # 空闲连接池，后进先出，优先复用最近使用过的连接
+        self._pool: "queue.LifoQueue[tuple]" = queue.LifoQueue(maxsize=pool_size)
+        # 空闲超过该时长（秒）的连接在使用前先检查是否仍然可用
+        self.ping_interval = ping_interval
+        # 当前线程事务中使用的连接
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """当前线程事务中使用的连接，不在事务中时为None"""
+        return getattr(self._local, "connection", None)
 
     def connect(self):
-        """建立数据库连接"""
-        if not self.connection:
-            self.connection = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci',
-                cursorclass=DictCursor
-            )
+        """建立新的数据库连接"""
+        return pymysql.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset='utf8mb4',
+            collation='utf8mb4_unicode_ci',
+            cursorclass=DictCursor,
+            # 池中的连接在语句之间不能停留在未结束的事务里，事务由 begin 显式开启
+            autocommit=True
+        )
 
     def disconnect(self):
-        """关闭数据库连接"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """关闭连接池中的所有空闲连接"""
+        while True:
+            try:
+                connection, _ = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except pymysql.err.Error:
+            pass
+
+    def _acquire(self):
+        """从连接池借出一个连接，池为空时新建"""
+        try:
+            connection, released_at = self._pool.get_nowait()
+        except queue.Empty:
+            return self.connect()
+        if time.monotonic() - released_at > self.ping_interval:
+            connection.ping(reconnect=True)
+        return connection
+
+    def _release(self, connection):
+        """归还连接，连接池已满时关闭"""
+        try:
+            self._pool.put_nowait((connection, time.monotonic()))
+        except queue.Full:
+            self._close(connection)
+
+    @contextmanager
+    def _connection(self):
+        """获取执行语句的连接：事务中使用当前线程绑定的连接，否则从连接池借用"""
+        connection = self.connection
+        if connection is not None:
+            yield connection
+            return
+        connection = self._acquire()
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # 连接可能已经失效，不再放回连接池
+            self._close(connection)
+            raise
+        except BaseException:
+            self._release(connection)
+            raise
+        self._release(connection)
 
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict]:
         """执行查询操作"""
-        try:
-            self.connect()
-            with self.connection.cursor() as cursor:
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
                 cursor.execute(query, params or ())
                 return cursor.fetchall()
-        finally:
-            self.disconnect()
 
     def execute_update(self, query: str, params: Optional[tuple] = None) -> int:
         """执行更新操作"""
-        try:
-            self.connect()
-            with self.connection.cursor() as cursor:
-                affected_rows = cursor.execute(query, params or ())
-                self.connection.commit()
-                return affected_rows
-        finally:
-            self.disconnect()
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
+                return cursor.execute(query, params or ())
 
     def execute_insert(self, query: str, params: Optional[tuple] = None) -> int:
         """执行插入操作"""
-        try:
-            self.connect()
-            with self.connection.cursor() as cursor:
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
                 cursor.execute(query, params or ())
-                self.connection.commit()
                 return cursor.lastrowid
-        finally:
-            self.disconnect()
 
     def execute_delete(self, query: str, params: Optional[tuple] = None) -> int:
         """执行删除操作"""
         return self.execute_update(query, params)
 
+    def execute_transaction(self, statements: List[Tuple[str, Any]]) -> List[int]:
+        """在同一连接、同一事务中依次执行多条语句，只提交一次
+
+        Args:
+            statements (List[Tuple[str, Any]]): (SQL语句, 参数) 列表，参数为list时使用executemany批量执行
+
+        Returns:
+            List[int]: 每条语句影响的行数
+        """
+        self.begin_transaction()
+        try:
+            affected_rows = []
+            with self.connection.cursor() as cursor:
+                for query, params in statements:
+                    if isinstance(params, list):
+                        affected_rows.append(cursor.executemany(query, params))
+                    else:
+                        affected_rows.append(cursor.execute(query, params or ()))
+        except BaseException:
+            self.rollback_transaction()
+            raise
+        self.commit_transaction()
+        return affected_rows
+
     def begin_transaction(self):
-        """开始事务"""
-        self.connect()
-        self.connection.begin()
+        """开始事务，事务结束前当前线程的语句都在同一个连接上执行"""
+        connection = self._acquire()
+        try:
+            connection.begin()
+        except BaseException:
+            self._close(connection)
+            raise
+        self._local.connection = connection
 
     def commit_transaction(self):
-        """提交事务"""
-        if self.connection:
-            self.connection.commit()
+        """提交事务并归还连接"""
+        connection = self.connection
+        if connection:
+            self._local.connection = None
+            try:
+                connection.commit()
+            except BaseException:
+                self._close(connection)
+                raise
+            self._release(connection)
 
     def rollback_transaction(self):
-        """回滚事务"""
-        if self.connection:
-            self.connection.rollback() 
\ No newline at end of file
+        """回滚事务并归还连接"""
+        connection = self.connection
+        if connection:
+            self._local.connection = None
+            try:
+                connection.rollback()
+            except BaseException:
+                self._close(connection)
+                raise
+            self._release(connection)
@@ -74,8 +74,8 @@ if __name__ == "__main__":
     )
     
     # 从配置中获取数据库连接信息
-    from src.config.GPTConfig import GPTConfig
-    config = GPTConfig()
+    from src.config.GPTConfig import get_config
+    config = get_config()
     
     # 创建数据库连接
     db = Database(
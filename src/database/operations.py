@@ -1,19 +1,35 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from .base import Database
+from .cache import TTLCache
 from .models import User, Conversation, Message, ConversationMessage, ToolCall, MessageToolCall, UserConversation, KnowledgeBaseFile, UserKnowledgeBase
 from ..interface.Messages import Messages
 import json
 import logging
 
+import pymysql
+
 logger = logging.getLogger(__name__)
 
+class DuplicateUserError(Exception):
+    """用户名违反 users.username 唯一约束"""
+
 class DatabaseOperations:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, user_cache_size: int = 10000, user_cache_ttl: float = 300):
         self.db = db
+        # 用户名 -> User 的查询缓存，只缓存存在的用户
+        self._user_cache = TTLCache(maxsize=user_cache_size, ttl=user_cache_ttl)
+        # 用户ID -> 服务器设置JSON字符串 的查询缓存，只缓存已有设置的用户；
+        # 缓存不可变的字符串，每次读取解析出新的dict，调用方修改结果不会影响缓存
+        self._settings_cache = TTLCache(maxsize=user_cache_size, ttl=user_cache_ttl)
 
     # User 相关操作
     def create_user(self, user: User) -> bool:
+        """创建用户，依赖 users.username 的唯一约束判断用户名是否已存在
+
+        Raises:
+            DuplicateUserError: 用户名已存在时抛出
+        """
         query = """
         INSERT INTO users (user_id, username, password, create_time, settings)
         VALUES (%s, %s, %s, %s, %s)
@@ -22,7 +38,13 @@ class DatabaseOperations:
             self.db.execute_insert(query, (
                 user.user_id, user.username, user.password, user.create_time, user.settings
             ))
+            self._user_cache.pop(user.username)
             return True
+        except pymysql.err.IntegrityError as e:
+            # 1062: 唯一键冲突
+            if e.args and e.args[0] == 1062:
+                raise DuplicateUserError(user.username) from e
+            return False
         except Exception:
             return False
 
@@ -35,11 +57,16 @@ class DatabaseOperations:
         return None
 
     def get_user_by_username(self, username: str) -> Optional[User]:
+        user = self._user_cache.get(username)
+        if user is not None:
+            return user
         query = "SELECT * FROM users WHERE username = %s"
         result = self.db.execute_query(query, (username,))
         if result:
             data = result[0]
-            return User(**data)
+            user = User(**data)
+            self._user_cache.set(username, user)
+            return user
         return None
 
     def get_user_by_phone(self, phone_number: str) -> Optional[User]:
@@ -56,18 +83,42 @@ class DatabaseOperations:
         try:
             # 将字典转换为JSON字符串
             server_json = json.dumps(server, ensure_ascii=False)
-            return self.db.execute_update(query, (server_json, user_id)) > 0
+            updated = self.db.execute_update(query, (server_json, user_id)) > 0
+            # 缓存中的用户对象包含settings字段，更新后需要失效
+            self._user_cache.pop_matching(lambda user: user.user_id == user_id)
+            if updated:
+                self._settings_cache.set(user_id, server_json)
+            else:
+                self._settings_cache.pop(user_id)
+            return updated
         except Exception as e:
             logger.error(f"更新用户服务器设置失败: {str(e)}")
             return False
 
+    def update_user_password(self, user_id: str, password: str) -> bool:
+        """更新用户存储的密码（哈希值）"""
+        query = "UPDATE users SET password = %s WHERE user_id = %s"
+        try:
+            updated = self.db.execute_update(query, (password, user_id)) > 0
+            # 缓存中的用户对象包含password字段，更新后需要失效
+            self._user_cache.pop_matching(lambda user: user.user_id == user_id)
+            return updated
+        except Exception as e:
+            logger.error(f"更新用户密码失败: {str(e)}")
+            return False
+
     def get_user_settings(self, user_id: str) -> Optional[dict]:
         """获取用户服务器设置"""
+        settings_json = self._settings_cache.get(user_id)
+        if settings_json is not None:
+            return json.loads(settings_json)
         query = "SELECT settings FROM users WHERE user_id = %s AND settings IS NOT NULL"
         result = self.db.execute_query(query, (user_id,))
         logger.info(f"获取到用户 {user_id} 的服务器设置: {result}")
         if result:
-            return json.loads(result[0]['settings'])
+            settings_json = result[0]['settings']
+            self._settings_cache.set(user_id, settings_json)
+            return json.loads(settings_json)
         return None
 
     # Conversation 相关操作
@@ -101,6 +152,31 @@ class DatabaseOperations:
             self.db.rollback_transaction()
             return False
 
+    def create_conversation_with_messages(self, conversation: Conversation, user_id: str, messages: List[Message]) -> bool:
+        """在一个事务中创建对话、关联用户并写入初始消息"""
+        query = """
+        INSERT INTO conversations (conversation_id, title, create_time, update_time, status)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        link_query = """
+        INSERT INTO user_conversations (user_id, conversation_id, create_time)
+        VALUES (%s, %s, %s)
+        """
+        try:
+            self.db.execute_transaction([
+                (query, (
+                    conversation.conversation_id, conversation.title,
+                    conversation.create_time, conversation.update_time,
+                    conversation.status
+                )),
+                (link_query, (user_id, conversation.conversation_id, conversation.create_time)),
+                *self._message_statements(messages, conversation.conversation_id)
+            ])
+            return True
+        except Exception as e:
+            logger.error(f"创建对话失败: {str(e)}", exc_info=True)
+            return False
+
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         query = "SELECT * FROM conversations WHERE conversation_id = %s"
         result = self.db.execute_query(query, (conversation_id,))
@@ -124,29 +200,21 @@ class DatabaseOperations:
             conversation_id (str): 对话ID
             
         Returns:
-            bool: 是否删除成功
+            bool: 是否删除成功，对话不存在时返回False
         """
         try:
-            self.db.begin_transaction()
-            
-            # 1. 删除对话消息关联
-            query1 = "DELETE FROM conversation_messages WHERE conversation_id = %s"
-            self.db.execute_delete(query1, (conversation_id,))
-            
-            # 2. 删除用户对话关联
-            query2 = "DELETE FROM user_conversations WHERE conversation_id = %s"
-            self.db.execute_delete(query2, (conversation_id,))
-            
-            # 3. 删除对话本身
-            query3 = "DELETE FROM conversations WHERE conversation_id = %s"
-            self.db.execute_delete(query3, (conversation_id,))
-            
-            self.db.commit_transaction()
-            return True
+            affected_rows = self.db.execute_transaction([
+                # 1. 删除对话消息关联
+                ("DELETE FROM conversation_messages WHERE conversation_id = %s", (conversation_id,)),
+                # 2. 删除用户对话关联
+                ("DELETE FROM user_conversations WHERE conversation_id = %s", (conversation_id,)),
+                # 3. 删除对话本身，根据影响行数判断对话是否存在
+                ("DELETE FROM conversations WHERE conversation_id = %s", (conversation_id,)),
+            ])
+            return affected_rows[-1] > 0
             
         except Exception as e:
             logger.error(f"删除对话失败: {str(e)}", exc_info=True)
-            self.db.rollback_transaction()
             return False
 
     # Message 相关操作
@@ -193,6 +261,38 @@ class DatabaseOperations:
             self.db.rollback_transaction()
             return False
 
+    def create_messages(self, messages: List[Message], conversation_id: str) -> bool:
+        """在一个事务中批量创建消息并关联对话"""
+        try:
+            self.db.execute_transaction(self._message_statements(messages, conversation_id))
+            return True
+        except Exception as e:
+            logger.error(f"批量创建消息失败: {str(e)}", exc_info=True)
+            return False
+
+    @staticmethod
+    def _message_statements(messages: List[Message], conversation_id: str) -> List[tuple]:
+        """构建批量写入消息及对话消息关联的语句"""
+        message_query = """
+        INSERT INTO messages (message_id, role, content, created_time,tool_calls, tool_call_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        link_query = """
+        INSERT INTO conversation_messages (conversation_id, message_id, create_time)
+        VALUES (%s, %s, %s)
+        """
+        message_rows = [
+            (
+                message.message_id, message.role,
+                message.content, message.created_time,
+                message.tool_calls, message.tool_call_id
+            )
+            for message in messages
+        ]
+        # 关联表按自增的seq排序，批量插入时seq按行的顺序分配，同一批消息的先后顺序不依赖时间精度
+        link_rows = [(conversation_id, message.message_id, message.created_time) for message in messages]
+        return [(message_query, message_rows), (link_query, link_rows)]
+
     def get_message(self, message_id: str) -> Optional[Message]:
         query = "SELECT * FROM messages WHERE message_id = %s"
         result = self.db.execute_query(query, (message_id,))
@@ -202,6 +302,42 @@ class DatabaseOperations:
         return None
 
     # ConversationMessage 相关操作
+    def migrate_conversation_message_seq(self) -> bool:
+        """为 conversation_messages 补齐自增列 seq，服务器启动时调用
+
+        消息的排序和增量查询都依赖 seq。列不存在时新增该列，按 (create_time, message_id) 为已有数据编号，
+        再改为自增列并建立索引；上次迁移中途失败、列已存在但还不是自增列时，从编号开始重新执行。
+
+        Returns:
+            bool: 本次是否执行了迁移
+        """
+        columns = self.db.execute_query(
+            """
+            SELECT EXTRA FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'conversation_messages' AND COLUMN_NAME = 'seq'
+            """
+        )
+        if columns and "auto_increment" in columns[0]["EXTRA"].lower():
+            return False
+
+        statements = []
+        if not columns:
+            statements.append(("ALTER TABLE conversation_messages ADD COLUMN seq BIGINT NULL", None))
+        statements.extend([
+            # 用户变量只在同一连接内有效，execute_transaction 的语句都在同一个连接上执行
+            ("SET @seq := 0", None),
+            ("UPDATE conversation_messages SET seq = (@seq := @seq + 1) ORDER BY create_time, message_id", None),
+            ("""
+            ALTER TABLE conversation_messages
+                MODIFY seq BIGINT NOT NULL AUTO_INCREMENT,
+                ADD UNIQUE KEY uk_seq (seq),
+                ADD INDEX idx_conversation_seq (conversation_id, seq)
+            """, None),
+        ])
+        self.db.execute_transaction(statements)
+        logger.info("conversation_messages 已添加自增列 seq")
+        return True
+
     def add_message_to_conversation(self, conversation_message: ConversationMessage) -> bool:
         query = """
         INSERT INTO conversation_messages (conversation_id, message_id, create_time)
@@ -246,7 +382,7 @@ class DatabaseOperations:
         SELECT m.* FROM messages m
         JOIN conversation_messages cm ON m.message_id = cm.message_id
         WHERE cm.conversation_id = %s
-        ORDER BY cm.create_time
+        ORDER BY cm.seq
         """
         results = self.db.execute_query(query, (conversation_id,))
         print(results)
@@ -256,16 +392,59 @@ class DatabaseOperations:
         return self._convert_to_messages_format(db_messages)
 
     def get_message_list(self, conversation_id: str) -> Messages:
-        query = """
-        SELECT m.* FROM messages m
-        JOIN conversation_messages cm ON m.message_id = cm.message_id
-        WHERE cm.conversation_id = %s
-        ORDER BY cm.create_time
+        messages, _, _ = self.get_messages_since(conversation_id)
+        return messages
+
+    def get_messages_since(
+        self,
+        conversation_id: str,
+        since_message_id: Optional[str] = None
+    ) -> Tuple[Messages, Optional[str], Optional[str]]:
+        """获取对话中指定消息之后写入的消息
+
+        since_message_id 不属于该对话（不存在或已被删除）时无法确定增量的起点，改为返回全部消息。
+
+        Args:
+            conversation_id (str): 对话ID
+            since_message_id (Optional[str]): 客户端已有的最后一条消息ID，为None时返回全部消息
+
+        Returns:
+            Tuple[Messages, Optional[str], Optional[str]]: 消息列表；已返回的最后一条消息ID（没有新消息时为since_message_id）；
+                实际生效的since_message_id，返回全部消息时为None
         """
-        results = self.db.execute_query(query, (conversation_id,))
+        since_seq = None
+        if since_message_id is not None:
+            result = self.db.execute_query(
+                "SELECT seq FROM conversation_messages WHERE conversation_id = %s AND message_id = %s",
+                (conversation_id, since_message_id)
+            )
+            if result:
+                since_seq = result[0]["seq"]
+            else:
+                logger.warning(f"对话 {conversation_id} 中不存在消息 {since_message_id}，返回全部消息")
+                since_message_id = None
+
+        if since_seq is None:
+            query = """
+            SELECT m.* FROM messages m
+            JOIN conversation_messages cm ON m.message_id = cm.message_id
+            WHERE cm.conversation_id = %s
+            ORDER BY cm.seq
+            """
+            params = (conversation_id,)
+        else:
+            query = """
+            SELECT m.* FROM messages m
+            JOIN conversation_messages cm ON m.message_id = cm.message_id
+            WHERE cm.conversation_id = %s AND cm.seq > %s
+            ORDER BY cm.seq
+            """
+            params = (conversation_id, since_seq)
+        results = self.db.execute_query(query, params)
         db_messages = [Message(**data) for data in results]
+        last_message_id = db_messages[-1].message_id if db_messages else since_message_id
 
-        return self._convert_to_messages_format(db_messages)
+        return self._convert_to_messages_format(db_messages), last_message_id, since_message_id
 
     # ToolCall 相关操作
     def create_tool_call(self, tool_call: ToolCall) -> bool:
@@ -357,6 +536,14 @@ class DatabaseOperations:
         results = self.db.execute_query(query, (knowledge_base_id,))
         return [KnowledgeBaseFile(**data) for data in results]
 
+    def get_knowledge_base_file_rows(self, knowledge_base_id: str) -> List[Dict[str, Any]]:
+        """获取知识库文件列表接口需要的列，直接返回查询结果行，不构造模型对象"""
+        query = """
+        SELECT file_id, file_name, file_path, summary, created_time
+        FROM knowledge_base_files WHERE knowledge_base_id = %s ORDER BY created_time DESC
+        """
+        return self.db.execute_query(query, (knowledge_base_id,))
+
     def get_knowledge_base_file(self, file_id: str) -> Optional[KnowledgeBaseFile]:
         query = "SELECT * FROM knowledge_base_files WHERE file_id = %s"
         result = self.db.execute_query(query, (file_id,))
@@ -388,6 +575,14 @@ class DatabaseOperations:
         results = self.db.execute_query(query, (user_id,))
         return [UserKnowledgeBase(**data) for data in results]
 
+    def get_user_knowledge_base_rows(self, user_id: str) -> List[Dict[str, Any]]:
+        """获取知识库列表接口需要的列，直接返回查询结果行，不构造模型对象"""
+        query = """
+        SELECT kb_id, title, created_time
+        FROM user_knowledge_bases WHERE user_id = %s ORDER BY created_time DESC
+        """
+        return self.db.execute_query(query, (user_id,))
+
     def get_knowledge_base(self, kb_id: str) -> Optional[UserKnowledgeBase]:
         query = "SELECT * FROM user_knowledge_bases WHERE kb_id = %s"
         result = self.db.execute_query(query, (kb_id,))
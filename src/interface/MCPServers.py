@@ -1,20 +1,51 @@
 class MCPServers:
     mcp_servers = None
 
-    def __init__(self, mcp_servers=[]):
-        self.mcp_servers = mcp_servers
+    def __init__(self, mcp_servers=None):
+        self.mcp_servers = mcp_servers if mcp_servers is not None else []
+        # 由服务器列表推导出的 (tools, available_functions)，列表变化后重新构建
+        self._compiled = None
 
 
-    def add_server(self, server_name:str,server_address:str,server_functions:list[str]):
+    def add_server(self, server_name:str,server_address:str,server_functions:list[str],idempotent:bool=False):
         """
             入参：server_name="百度搜索",server_address="127.0.0.1:8080",server_function=[web_search]
+            idempotent=True 表示该服务器的函数无副作用，相同参数的重复调用可以只执行一次
         """
         server = {
             'server_name': server_name,
             'server_address': server_address,
             'server_functions': server_functions,
+            'idempotent': idempotent,
         }
         self.mcp_servers.append(server)
+        self._compiled = None
 
     def get_servers(self):
-        return self.mcp_servers
\ No newline at end of file
+        return self.mcp_servers
+
+    def compiled(self):
+        """返回模型可用的工具列表，以及函数名到服务器地址的映射
+
+        结果会被缓存，直到通过 add_server 修改服务器列表。
+
+        Returns:
+            tuple[list, dict]: (tools, available_functions)
+        """
+        if self._compiled is None:
+            tools = []
+            available_functions = {}
+            for mcp_server in self.mcp_servers:
+                tools.extend(mcp_server["server_functions"])
+                for server_function in mcp_server["server_functions"]:
+                    available_functions[server_function["function"]["name"]] = mcp_server["server_address"]
+            self._compiled = (tools, available_functions)
+        return self._compiled
+
+    def idempotent_addresses(self) -> set:
+        """返回标记为幂等的服务器地址集合"""
+        return {
+            mcp_server["server_address"]
+            for mcp_server in self.mcp_servers
+            if mcp_server.get("idempotent")
+        }
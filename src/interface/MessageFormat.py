@@ -1,9 +1,9 @@
-import json
 from enum import Enum
-from typing import Dict, List, Any, TypedDict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, TypedDict
 
 from src.database.models import Conversation
-from src.interface import Messages
+from src.interface import Messages, serialization
 
 
 class MessageFormat:
@@ -25,6 +25,7 @@ class MessageFormat:
         CONVERSATION_MESSAGE = "conversation_message"
         ANSWER = "server_answer"
         SELECT_TOOLS = "server_select_function"
+        TOOL_PROGRESS = "tool_progress"
         HEARTBEAT_ACK = "heartbeat_ack"
         ERROR = "error"
         CONVERSATION_TITLE = "conversation_title"
@@ -98,12 +99,12 @@ class MessageFormat:
     @staticmethod
     def _create_json_message(message_type: str, **kwargs) -> str:
         """创建JSON消息的通用方法"""
-        result = {"type": message_type, **kwargs}
-        return json.dumps(result, ensure_ascii=False)
+        return serialization.dumps({"type": message_type, **kwargs})
     
     @staticmethod
+    @lru_cache(maxsize=1024)
     def create_auth_success_response(user_id: str, username: str) -> str:
-        """创建认证成功消息"""
+        """创建认证成功消息（按用户缓存）"""
         return MessageFormat._create_json_message(
             MessageFormat.ResponseType.AUTH_SUCCESS.value,
             user_id=user_id,
@@ -112,7 +113,7 @@ class MessageFormat:
     @staticmethod
     def create_auth_message(user_id: str) -> str:
         """创建认证消息"""
-        return json.dumps({"user_id": user_id}, ensure_ascii=False)
+        return serialization.dumps({"user_id": user_id})
     
     @staticmethod
     def create_question_request(question: str) -> str:
@@ -139,8 +140,8 @@ class MessageFormat:
 
     @staticmethod
     def create_answer_response(answer: str) -> str:
-        """创建回答响应"""
-        return MessageFormat._create_json_message(MessageFormat.ResponseType.ANSWER.value, answer=answer)
+        """创建回答响应（流式热路径，使用固定前缀拼接，只序列化回答内容）"""
+        return _ANSWER_PREFIX + serialization.dumps(answer) + "}"
     
     @staticmethod
     def create_tool_selection_response(select_functions: List[Dict[str, Any]]) -> str:
@@ -150,6 +151,15 @@ class MessageFormat:
             select_functions=select_functions
         )
     
+    @staticmethod
+    def create_tool_progress_response(tool_call_id: str, result: str) -> str:
+        """创建单个工具调用完成的进度响应"""
+        return MessageFormat._create_json_message(
+            MessageFormat.ResponseType.TOOL_PROGRESS.value,
+            tool_call_id=tool_call_id,
+            result=result
+        )
+    
     @staticmethod
     def create_json_rpc_request(id: str, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """创建JSON-RPC请求"""
@@ -207,18 +217,33 @@ class MessageFormat:
         )
 
     @staticmethod
-    def create_conversation_message_response(conversation_id: str, messages: Messages) -> str:
-        """创建对话消息响应"""
+    def create_conversation_message_response(
+        conversation_id: str,
+        messages: Messages,
+        last_message_id: Optional[str] = None,
+        since_message_id: Optional[str] = None
+    ) -> str:
+        """创建对话消息响应
+
+        since_message_id 不为空表示 messages 只包含该消息之后的新消息，为空表示完整的消息记录
+        （包括客户端请求的 since_message_id 已不存在的情况），客户端应以此替换本地记录；
+        客户端下次请求时可将 last_message_id 作为 since_message_id 增量获取。
+        """
         return MessageFormat._create_json_message(
             MessageFormat.ResponseType.CONVERSATION_MESSAGE.value,
             conversation_id=conversation_id,
-            messages=messages.get_messages()
+            messages=messages.get_messages(),
+            last_message_id=last_message_id,
+            since_message_id=since_message_id
         )
 
 
     @staticmethod
     def create_error_response(error_message: str, error_code: int) -> str:
-        """创建错误响应"""
+        """创建错误响应
+
+        错误信息常包含异常文本等动态内容，不做缓存；内容固定的错误响应由调用方在模块级预先生成。
+        """
         return MessageFormat._create_json_message(
             MessageFormat.ResponseType.ERROR.value,
             code=error_code,
@@ -228,19 +253,25 @@ class MessageFormat:
     @staticmethod
     def is_heartbeat_message(message: str) -> bool:
         """判断是否为心跳消息"""
+        # 不包含类型字符串的消息一定不是心跳消息，无需解析JSON
+        if isinstance(message, str) and _HEARTBEAT_MARKER not in message:
+            return False
         try:
-            data = json.loads(message)
+            data = serialization.loads(message)
             return data.get("type") == MessageFormat.RequestType.HEARTBEAT.value
-        except json.JSONDecodeError:
+        except serialization.JSONDecodeError:
             return False
     
     @staticmethod
     def is_heartbeat_ack_message(message: str) -> bool:
         """判断是否为心跳确认消息"""
+        # 不包含类型字符串的消息一定不是心跳确认消息，无需解析JSON
+        if isinstance(message, str) and _HEARTBEAT_ACK_MARKER not in message:
+            return False
         try:
-            data = json.loads(message)
+            data = serialization.loads(message)
             return data.get("type") == MessageFormat.ResponseType.HEARTBEAT_ACK.value
-        except json.JSONDecodeError:
+        except serialization.JSONDecodeError:
             return False
 
     @staticmethod
@@ -268,3 +299,11 @@ class MessageFormat:
             conversation_id=conversation_id,
             message="对话删除成功"
         )
+
+
+# 心跳类消息中必然出现的类型字符串，用于在解析JSON前快速排除普通消息
+_HEARTBEAT_MARKER = '"' + MessageFormat.RequestType.HEARTBEAT.value + '"'
+_HEARTBEAT_ACK_MARKER = '"' + MessageFormat.ResponseType.HEARTBEAT_ACK.value + '"'
+
+# 回答响应的固定前缀，流式输出时只需序列化回答内容
+_ANSWER_PREFIX = '{"type":' + serialization.dumps(MessageFormat.ResponseType.ANSWER.value) + ',"answer":'
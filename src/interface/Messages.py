@@ -7,6 +7,12 @@ class Messages:
     def get_messages(self):
         return self.messages
 
+    def copy(self):
+        """复制消息列表及其中的每条消息，修改副本不影响原对象"""
+        messages = Messages()
+        messages.messages = [dict(message) for message in self.messages]
+        return messages
+
     def add_tool_message(self, tool_call_id, function_result):
         self.messages.append(self._transform_tool_message(tool_call_id, function_result))
 
@@ -1,6 +1,6 @@
-import json
 import logging
 
+from src.interface import serialization
 from src.interface.MCPServers import MCPServers
 
 logger = logging.getLogger(__name__)
@@ -85,7 +85,7 @@ class WebsocketMessage:
 
     def __init__(self, message):
         try:
-            self.message = json.loads(message)
+            self.message = serialization.loads(message)
             logger.info(f"当前WebSocketMessage:{self.message}")
         except Exception as e:
             logger.error("WebSocketMessage转化失败")
@@ -150,6 +150,11 @@ class WebsocketMessage:
                 logger.warning("用户的Json格式不包含'select_functions'属性")
                 raise KeyError
             
+    def get_since_message_id(self):
+        """客户端已有的最后一条消息ID，用于增量获取对话消息，可选"""
+        if self.message is not None:
+            return self.message.get("since_message_id")
+
     def get_conversation_id(self):
         if self.message is not None:
             try:
@@ -0,0 +1,27 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson不可用时回退到标准库json
+    orjson = None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，统一捕获该异常即可
+JSONDecodeError = json.JSONDecodeError
+
+
+if orjson is not None:
+    def loads(data):
+        """解析JSON，支持str和bytes输入"""
+        return orjson.loads(data)
+
+    def dumps(obj) -> str:
+        """序列化为JSON字符串（不转义非ASCII字符）"""
+        return orjson.dumps(obj).decode()
+else:
+    def loads(data):
+        """解析JSON，支持str和bytes输入"""
+        return json.loads(data)
+
+    def dumps(obj) -> str:
+        """序列化为JSON字符串（不转义非ASCII字符）"""
+        return json.dumps(obj, ensure_ascii=False)
@@ -5,8 +5,8 @@ import sys
 import multiprocessing
 from typing import List, Optional
 
-from src.GPTServer.GPTServer import GPTServer, start_server
-from src.GPTServer.HTTPServer import start_http_server
+from src.GPTServer.GPTServer import GPTServer, start_server, run_event_loop
+from src.GPTServer.HTTPServer import serve_http_server
 from src.MCPServer.Time import run_server as run_time_server
 from src.MCPServer.ExecutePythonCode import run_server as run_python_server
 from src.MCPServer.BoChaServer import run_server as run_bocha_server
@@ -18,20 +18,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_websocket_server():
-    """运行WebSocket服务器"""
+async def serve_websocket_and_http():
+    """在同一个事件循环中同时运行WebSocket服务器和HTTP服务器
+
+    任一服务器退出（如HTTP服务器收到终止信号或启动失败）时取消另一个，
+    保证两个服务器都能执行各自的清理。
+    """
+    tasks = [
+        asyncio.create_task(start_server(GPTServer.handler)),
+        asyncio.create_task(serve_http_server())
+    ]
     try:
-        # 启动服务器
-        asyncio.run(start_server(GPTServer.handler))
-    except Exception as e:
-        logger.error(f"WebSocket服务器启动失败: {str(e)}")
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
 
-def run_http_server():
-    """运行HTTP服务器"""
+def run_websocket_server():
+    """运行WebSocket服务器和HTTP服务器"""
     try:
-        start_http_server()
+        # 启动服务器
+        run_event_loop(serve_websocket_and_http())
     except Exception as e:
-        logger.error(f"HTTP服务器启动失败: {str(e)}")
+        logger.error(f"WebSocket/HTTP服务器启动失败: {str(e)}")
 
 def run_time_server_process():
     """运行时间服务器"""
@@ -62,17 +75,11 @@ def main():
     processes = []
     
     try:
-        # 启动WebSocket服务器
+        # 启动WebSocket服务器和HTTP服务器（共用一个进程和事件循环）
         ws_process = multiprocessing.Process(target=run_websocket_server)
         ws_process.start()
         processes.append(ws_process)
-        logger.info("WebSocket服务器启动成功")
-        
-        # 启动HTTP服务器
-        http_process = multiprocessing.Process(target=run_http_server)
-        http_process.start()
-        processes.append(http_process)
-        logger.info("HTTP服务器启动成功")
+        logger.info("WebSocket服务器和HTTP服务器启动成功")
         
         # 启动时间服务器
         time_process = multiprocessing.Process(target=run_time_server_process)
@@ -1,21 +1,24 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 from ..interface.EnumModel import EnumModel
 from ..interface.Messages import Messages
 
 class GPTModel:
     client: OpenAI
+    async_client: AsyncOpenAI
     model:EnumModel
 
 
     def __init__(self,base_url,api_key,model):
         self.client = OpenAI(base_url=base_url,api_key=api_key)
+        # 流式对话在事件循环中迭代，使用异步客户端避免阻塞其他连接
+        self.async_client = AsyncOpenAI(base_url=base_url,api_key=api_key)
         self.model = model
 
-    def chat_stream(self, messages:Messages, tools=None, temperature=0):
+    async def chat_stream(self, messages:Messages, tools=None, temperature=0):
         if tools is None:
             tools = []
-        completion = self.client.chat.completions.create(
+        completion = await self.async_client.chat.completions.create(
             model=self.model.value,
             messages=messages.get_messages(),
             tools=tools,
@@ -44,14 +47,15 @@ class GPTModel:
         )
         return completion.choices[0].message.content
     
-    def embed_texts(self, texts,model=EnumModel.TEXT_EMBEDDING_3_SMALL) -> list:
+    def embed_texts(self, texts,model=EnumModel.TEXT_EMBEDDING_3_SMALL,batch_size=64) -> list:
+        # 每次请求提交一批文本，返回的向量按 index 还原为输入顺序
         embeds = []
-        for text in texts:
+        for start in range(0, len(texts), batch_size):
             response = self.client.embeddings.create(
-                input=text,
+                input=texts[start:start + batch_size],
                 model=model.value
             )
-            embeds.append(response.data[0].embedding)
+            embeds.extend(data.embedding for data in sorted(response.data, key=lambda data: data.index))
         return embeds
             
 
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+
+from src.GPTServer.DatabaseWriter import DatabaseWriter
+
+class TestDatabaseWriterClass(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.writer = DatabaseWriter(retries=2, retry_delay=0)
+        self.written = []
+        self._lock = threading.Lock()
+
+    def _write(self, value, delay=0.0):
+        time.sleep(delay)
+        with self._lock:
+            self.written.append(value)
+        return True
+
+    async def test_same_key_in_order(self):
+        self.writer.submit("conversation-1", self._write, "a", 0.05)
+        task = self.writer.submit("conversation-1", self._write, "b")
+        self.assertTrue(await task, "DatabaseWriter的写入结果测试失败")
+        self.assertEqual(self.written, ["a", "b"], "DatabaseWriter的写入顺序测试失败")
+
+    async def test_retry_when_failed(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("写入失败")
+            return True
+
+        self.assertTrue(await self.writer.submit("conversation-1", flaky), "DatabaseWriter的重试测试失败")
+        self.assertEqual(len(attempts), 3, "DatabaseWriter的重试测试失败")
+
+    async def test_retry_when_not_success(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            return len(attempts) == 3
+
+        self.assertTrue(
+            await self.writer.submit("conversation-1", flaky, success=bool),
+            "DatabaseWriter的success重试测试失败"
+        )
+        self.assertEqual(len(attempts), 3, "DatabaseWriter的success重试测试失败")
+
+    async def test_falsy_result_without_success(self):
+        attempts = []
+
+        def empty():
+            attempts.append(1)
+            return 0
+
+        self.assertEqual(await self.writer.submit("conversation-1", empty), 0, "DatabaseWriter的返回值测试失败")
+        self.assertEqual(len(attempts), 1, "DatabaseWriter未传success时不应按返回值重试")
+
+    async def test_give_up_after_retries(self):
+        self.assertFalse(
+            await self.writer.submit("conversation-1", lambda: False, success=bool),
+            "DatabaseWriter的重试上限测试失败"
+        )
+
+        def failed():
+            raise RuntimeError("写入失败")
+
+        with self.assertRaises(RuntimeError, msg="DatabaseWriter的重试上限测试失败"):
+            await self.writer.submit("conversation-1", failed)
+
+    async def test_no_retry(self):
+        attempts = []
+
+        def failed():
+            attempts.append(1)
+            return False
+
+        self.assertFalse(
+            await self.writer.submit("conversation-1", failed, retries=0, success=bool),
+            "DatabaseWriter的禁用重试测试失败"
+        )
+        self.assertEqual(len(attempts), 1, "DatabaseWriter的禁用重试测试失败")
+
+    async def test_wait(self):
+        self.writer.submit("conversation-1", self._write, "a", 0.02)
+        await self.writer.wait("conversation-1")
+        self.assertEqual(self.written, ["a"], "DatabaseWriter的等待写入测试失败")
+
+    async def test_close(self):
+        self.writer.submit("conversation-1", self._write, "a", 0.02)
+        self.writer.submit("conversation-2", self._write, "b")
+        await self.writer.close()
+        self.assertEqual(sorted(self.written), ["a", "b"], "DatabaseWriter的关闭测试失败")
+
+
+if __name__ == '__main__':
+    unittest.main()
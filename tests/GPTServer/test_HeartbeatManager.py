@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from websockets.exceptions import ConnectionClosed
+
+from src.GPTServer.HeartbeatManager import HeartbeatManager
+
+class _FakeWebsocket:
+    """记录发送内容的连接，closed 为 True 后发送时抛出 ConnectionClosed"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send(self, message):
+        if self.closed:
+            raise ConnectionClosed(None, None)
+        self.sent.append(message)
+
+
+class TestHeartbeatManagerClass(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.websocket = _FakeWebsocket()
+        self.manager = HeartbeatManager(self.websocket, "user-1", interval=0, timeout=30)
+
+    async def test_stop_wakes_waiter(self):
+        task = await self.manager.start()
+        await asyncio.sleep(0.01)
+        # 不经过任务取消，只依靠 stop 唤醒等待心跳确认的协程
+        self.manager._heartbeat_task = None
+        self.manager.stop()
+        await asyncio.wait_for(task, 1)
+        self.assertFalse(self.manager.is_running, "HeartbeatManager的停止测试失败")
+
+
+    async def test_connection_closed(self):
+        self.websocket.closed = True
+        task = await self.manager.start()
+        await asyncio.wait_for(task, 1)
+        self.assertFalse(self.manager.is_running, "HeartbeatManager的连接关闭测试失败")
+        self.assertEqual(self.websocket.sent, [], "连接关闭后不应再发送消息")
+
+
+if __name__ == '__main__':
+    unittest.main()
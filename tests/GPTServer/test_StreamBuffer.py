@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from src.GPTServer.StreamBuffer import StreamBuffer
+
+class TestStreamBufferClass(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sent = []
+
+        async def send(text: str):
+            self.sent.append(text)
+
+        self.buffer = StreamBuffer(send, max_chars=8, max_delay=60)
+
+    async def test_merge_small_deltas(self):
+        await self.buffer.append("ab")
+        await self.buffer.append("cd")
+        self.assertEqual(self.sent, [], "StreamBuffer的合并测试失败")
+        await self.buffer.flush()
+        self.assertEqual(self.sent, ["abcd"], "StreamBuffer的合并测试失败")
+
+    async def test_flush_when_full(self):
+        await self.buffer.append("abcd")
+        await self.buffer.append("efgh")
+        self.assertEqual(self.sent, ["abcdefgh"], "StreamBuffer的阈值发送测试失败")
+
+    async def test_flush_when_delay_exceeded(self):
+        sent = []
+
+        async def send(text: str):
+            sent.append(text)
+
+        buffer = StreamBuffer(send, max_chars=1024, max_delay=0)
+        await buffer.append("a")
+        self.assertEqual(sent, ["a"], "StreamBuffer的超时发送测试失败")
+
+    async def test_flush_by_timer(self):
+        sent = []
+
+        async def send(text: str):
+            sent.append(text)
+
+        buffer = StreamBuffer(send, max_chars=1024, max_delay=0.01)
+        await buffer.append("a")
+        await buffer.append("b")
+        self.assertEqual(sent, [], "StreamBuffer的定时发送测试失败")
+        await asyncio.sleep(0.05)
+        self.assertEqual(sent, ["ab"], "StreamBuffer的定时发送测试失败")
+        await buffer.flush()
+        self.assertEqual(sent, ["ab"], "StreamBuffer的定时发送测试失败")
+
+    async def test_flush_waits_for_timer(self):
+        sent = []
+        sending = asyncio.Event()
+        release = asyncio.Event()
+
+        async def send(text: str):
+            sending.set()
+            await release.wait()
+            sent.append(text)
+
+        buffer = StreamBuffer(send, max_chars=1024, max_delay=0.01)
+        await buffer.append("a")
+        await sending.wait()
+        await buffer.append("b")
+        flush_task = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        self.assertFalse(flush_task.done(), "StreamBuffer的flush应等待定时发送结束")
+        release.set()
+        await flush_task
+        self.assertEqual(sent, ["a", "b"], "StreamBuffer的定时发送顺序测试失败")
+
+    async def test_count_characters(self):
+        await self.buffer.append("你好你好")
+        self.assertEqual(self.sent, [], "StreamBuffer应按字符数计算阈值")
+        await self.buffer.append("你好你好")
+        self.assertEqual(self.sent, ["你好你好你好你好"], "StreamBuffer应按字符数计算阈值")
+
+    async def test_flush_empty(self):
+        await self.buffer.flush()
+        self.assertEqual(self.sent, [], "StreamBuffer的空缓冲测试失败")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+
+from websockets.exceptions import ConnectionClosed
+
+from src.GPTServer.WebsocketManager import WebsocketManager
+
+class _FakeWebsocket:
+    """记录发送内容的连接，closed 为 True 后发送时抛出 ConnectionClosed"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send(self, message):
+        if self.closed:
+            raise ConnectionClosed(None, None)
+        self.sent.append(message)
+
+
+class TestWebsocketManagerClass(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.manager = WebsocketManager(send_queue_size=4, send_timeout=0.05)
+        self.websocket = _FakeWebsocket()
+        self.manager.add_connection("user-1", self.websocket)
+
+    async def asyncTearDown(self):
+        self.manager.remove_connection("user-1")
+
+    async def test_send_to_user(self):
+        await self.manager.send_to_user("user-1", "你好")
+        await asyncio.sleep(0)
+        self.assertEqual(self.websocket.sent, ["你好"], "WebsocketManager的发送测试失败")
+
+    async def test_send_after_connection_closed(self):
+        await self.manager.send_to_user("user-1", "a")
+        await asyncio.sleep(0)
+        self.websocket.closed = True
+        # 连接在流式回答途中关闭，后续消息远多于队列长度，send_to_user 必须及时返回
+        await asyncio.wait_for(
+            asyncio.gather(*(self.manager.send_to_user("user-1", str(i)) for i in range(100))),
+            timeout=1
+        )
+        self.assertNotIn("user-1", self.manager._send_queues, "WebsocketManager的连接关闭测试失败")
+        await asyncio.wait_for(self.manager.send_to_user("user-1", "b"), timeout=1)
+        self.assertEqual(self.websocket.sent, ["a"], "WebsocketManager的连接关闭测试失败")
+
+    async def test_drop_when_queue_full(self):
+        blocked = asyncio.Event()
+
+        async def send(message):
+            await blocked.wait()
+            self.websocket.sent.append(message)
+
+        self.websocket.send = send
+        # 写任务阻塞在发送上，超出队列长度的消息等待 send_timeout 后被丢弃，send_to_user 必须及时返回
+        await asyncio.wait_for(
+            asyncio.gather(*(self.manager.send_to_user("user-1", str(i)) for i in range(10))),
+            timeout=1
+        )
+        blocked.set()
+        await asyncio.sleep(0.01)
+        # 写任务正在发送的一条加上队列中的4条，其余消息被丢弃，已发送的消息保持提交顺序
+        self.assertEqual(
+            self.websocket.sent,
+            ["0", "1", "2", "3", "4"],
+            "WebsocketManager的队列已满丢弃测试失败"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import time
+import unittest
+
+from src.database.cache import TTLCache
+
+class TestTTLCacheClass(unittest.TestCase):
+
+    cache: TTLCache
+
+    def setUp(self):
+        self.cache = TTLCache(maxsize=2, ttl=60)
+
+    def tearDown(self):
+        self.cache = None
+
+    def test_get_and_set(self):
+        self.cache.set("alice", 1)
+        self.assertEqual(self.cache.get("alice"), 1, "TTLCache的读写测试失败")
+        self.assertIsNone(self.cache.get("bob"), "TTLCache的未命中测试失败")
+
+    def test_evict_least_recently_used(self):
+        self.cache.set("alice", 1)
+        self.cache.set("bob", 2)
+        self.cache.get("alice")
+        self.cache.set("carol", 3)
+        self.assertIsNone(self.cache.get("bob"), "TTLCache的LRU淘汰测试失败")
+        self.assertEqual(self.cache.get("alice"), 1, "TTLCache的LRU淘汰测试失败")
+
+    def test_expire(self):
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set("alice", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("alice"), "TTLCache的过期测试失败")
+
+    def test_pop_matching(self):
+        self.cache.set("alice", 1)
+        self.cache.set("bob", 2)
+        self.cache.pop_matching(lambda value: value == 1)
+        self.assertIsNone(self.cache.get("alice"), "TTLCache的条件删除测试失败")
+        self.assertEqual(self.cache.get("bob"), 2, "TTLCache的条件删除测试失败")
+
+
+if __name__ == '__main__':
+    unittest.main()
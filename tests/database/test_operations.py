@@ -0,0 +1,49 @@
+import unittest
+
+from src.database.operations import DatabaseOperations
+
+class _FakeDatabase:
+    """记录执行的语句，查询返回预设的结果"""
+
+    def __init__(self, query_results=None):
+        self.query_results = list(query_results or [])
+        self.transactions = []
+
+    def execute_query(self, query, params=None):
+        return self.query_results.pop(0) if self.query_results else []
+
+    def execute_transaction(self, statements):
+        self.transactions.append([query.split()[0] for query, _ in statements])
+        return [0] * len(statements)
+
+
+class TestDatabaseOperationsClass(unittest.TestCase):
+
+    def test_migrate_seq_when_column_missing(self):
+        db = _FakeDatabase([[]])
+        self.assertTrue(DatabaseOperations(db).migrate_conversation_message_seq(), "seq迁移测试失败")
+        self.assertEqual(db.transactions, [["ALTER", "SET", "UPDATE", "ALTER"]], "seq迁移测试失败")
+
+    def test_migrate_seq_resume(self):
+        db = _FakeDatabase([[{"EXTRA": ""}]])
+        self.assertTrue(DatabaseOperations(db).migrate_conversation_message_seq(), "seq迁移续跑测试失败")
+        self.assertEqual(db.transactions, [["SET", "UPDATE", "ALTER"]], "seq迁移续跑测试失败")
+
+    def test_migrate_seq_already_done(self):
+        db = _FakeDatabase([[{"EXTRA": "auto_increment"}]])
+        self.assertFalse(DatabaseOperations(db).migrate_conversation_message_seq(), "seq已迁移测试失败")
+        self.assertEqual(db.transactions, [], "seq已迁移测试失败")
+
+    def test_user_settings_not_shared(self):
+        db = _FakeDatabase([[{"settings": '{"servers": ["http://localhost:8000"]}'}]])
+        operations = DatabaseOperations(db)
+        operations.get_user_settings("user-1")["servers"].append("http://localhost:9000")
+        self.assertEqual(
+            operations.get_user_settings("user-1"),
+            {"servers": ["http://localhost:8000"]},
+            "修改返回的服务器设置不应影响缓存"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from src.interface.MCPServers import MCPServers
+
+def _function(name: str) -> dict:
+    return {"type": "function", "function": {"name": name, "parameters": {}}}
+
+class TestMCPServersClass(unittest.TestCase):
+
+    mcp_servers: MCPServers
+
+    def setUp(self):
+        self.mcp_servers = MCPServers()
+        self.mcp_servers.add_server("时间服务", "http://127.0.0.1:8001", [_function("get_time")])
+
+    def tearDown(self):
+        self.mcp_servers = None
+
+    def test_default_servers_not_shared(self):
+        self.assertEqual(MCPServers().get_servers(), [], "MCPServers的默认参数测试失败")
+
+    def test_compiled(self):
+        tools, available_functions = self.mcp_servers.compiled()
+        self.assertEqual(tools, [_function("get_time")], "MCPServers的工具列表测试失败")
+        self.assertEqual(
+            available_functions,
+            {"get_time": "http://127.0.0.1:8001"},
+            "MCPServers的函数映射测试失败"
+        )
+        self.assertIs(self.mcp_servers.compiled(), self.mcp_servers.compiled(), "MCPServers的缓存测试失败")
+
+    def test_compiled_after_add_server(self):
+        self.mcp_servers.compiled()
+        self.mcp_servers.add_server("搜索服务", "http://127.0.0.1:8002", [_function("web_search")])
+        _, available_functions = self.mcp_servers.compiled()
+        self.assertEqual(
+            available_functions["web_search"],
+            "http://127.0.0.1:8002",
+            "MCPServers的缓存失效测试失败"
+        )
+
+    def test_idempotent_addresses(self):
+        self.mcp_servers.add_server("搜索服务", "http://127.0.0.1:8002", [_function("web_search")], idempotent=True)
+        self.assertEqual(
+            self.mcp_servers.idempotent_addresses(),
+            {"http://127.0.0.1:8002"},
+            "MCPServers的幂等服务器测试失败"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,6 +56,17 @@ class TestMessageClass(unittest.TestCase):
             "Message类的user消息测试失败"
         )
 
+    def test_copy(self):
+        self.messages.add_system_message("你是一个助手")
+        copied = self.messages.copy()
+        copied.get_messages()[0]["content"] = "新的系统提示词"
+        copied.add_user_message("请问周杰伦是谁？")
+        self.assertEqual(
+            self.messages.get_messages(),
+            [{'role': 'system', 'content': '你是一个助手'}],
+            "Message类的copy测试失败，修改副本影响了原对象"
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
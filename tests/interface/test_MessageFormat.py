@@ -0,0 +1,83 @@
+import json
+import unittest
+
+from src.interface import Messages
+from src.interface.MessageFormat import MessageFormat
+
+class TestMessageFormatClass(unittest.TestCase):
+
+    def test_create_auth_success_response(self):
+        response = MessageFormat.create_auth_success_response("user-1", "周杰伦")
+        self.assertEqual(
+            json.loads(response),
+            {"type": "auth_success", "user_id": "user-1", "username": "周杰伦"},
+            "MessageFormat的认证成功消息测试失败"
+        )
+        self.assertIs(
+            MessageFormat.create_auth_success_response("user-1", "周杰伦"),
+            response,
+            "MessageFormat的认证成功消息缓存测试失败"
+        )
+
+    def test_create_error_response(self):
+        response = MessageFormat.create_error_response("密码错误", 1004)
+        self.assertEqual(
+            json.loads(response),
+            {"type": "error", "code": 1004, "message": "密码错误"},
+            "MessageFormat的错误消息测试失败"
+        )
+
+    def test_create_answer_response(self):
+        response = MessageFormat.create_answer_response('周杰伦"\n')
+        self.assertEqual(
+            json.loads(response),
+            {"type": "server_answer", "answer": '周杰伦"\n'},
+            "MessageFormat的回答消息测试失败"
+        )
+
+    def test_create_tool_progress_response(self):
+        response = MessageFormat.create_tool_progress_response("call-1", '{"time": "12:00"}')
+        self.assertEqual(
+            json.loads(response),
+            {"type": "tool_progress", "tool_call_id": "call-1", "result": '{"time": "12:00"}'},
+            "MessageFormat的工具进度消息测试失败"
+        )
+
+    def test_create_conversation_message_response(self):
+        messages = Messages()
+        messages.add_user_message("你好")
+        response = MessageFormat.create_conversation_message_response(
+            "conversation-1",
+            messages,
+            last_message_id="message-2",
+            since_message_id="message-1"
+        )
+        self.assertEqual(
+            json.loads(response),
+            {
+                "type": "conversation_message",
+                "conversation_id": "conversation-1",
+                "messages": [{"role": "user", "content": "你好"}],
+                "last_message_id": "message-2",
+                "since_message_id": "message-1"
+            },
+            "MessageFormat的对话消息响应测试失败"
+        )
+
+    def test_is_heartbeat_ack_message(self):
+        self.assertTrue(
+            MessageFormat.is_heartbeat_ack_message('{"type": "heartbeat_ack", "data": {}}'),
+            "MessageFormat的心跳确认判断测试失败"
+        )
+        self.assertFalse(
+            MessageFormat.is_heartbeat_ack_message('{"type": "user_question", "question": "你好"}'),
+            "MessageFormat的心跳确认判断测试失败"
+        )
+        self.assertFalse(
+            MessageFormat.is_heartbeat_ack_message('heartbeat_ack'),
+            "MessageFormat的心跳确认判断测试失败"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()